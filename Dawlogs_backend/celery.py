@@ -24,4 +24,10 @@ app.conf.beat_schedule = {
         'task': 'versions.download_tasks.cleanup_expired_downloads',
         'schedule': crontab(minute=0),  # Every hour at :00
     },
+
+    # Sweep storage files left behind by cleanup tasks that never ran
+    'reap-orphaned-storage': {
+        'task': 'versions.cleanup_tasks.reap_orphaned_storage',
+        'schedule': crontab(minute=30, hour='*/6'),  # Every 6 hours at :30
+    },
 }
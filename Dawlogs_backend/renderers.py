@@ -0,0 +1,80 @@
+"""
+Dawlogs_backend/renderers.py
+JSON renderers backed by orjson (fall back to the stdlib encoder when it is not installed)
+"""
+
+import json
+import functools
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Datetimes go through DRF's encoder so the format matches JSONRenderer
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder_default(encoder_class):
+    """Bound default() of one encoder instance per class, shared by every response"""
+    return encoder_class().default
+
+
+def dumps_json(data, encoder_class=encoders.JSONEncoder):
+    """Encode data as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder_default(encoder_class), option=ORJSON_OPTIONS)
+    return json.dumps(
+        data, cls=encoder_class, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+class OrjsonRenderer(JSONRenderer):
+    """
+    Encode responses with orjson
+    Datetimes and other non-native types go through DRF's encoder so the
+    output format matches JSONRenderer. Indented (browsable/?indent=)
+    responses still use the stdlib path.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = dumps_json(data, self.encoder_class)
+
+        # Same JavaScript-safety escaping as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class JsonLinesRenderer(BaseRenderer):
+    """
+    JSON Lines (application/x-ndjson) - one JSON document per line
+    Views stream rows through render_line(); a list handed to render()
+    becomes one line per item, anything else a single line
+    """
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+    charset = None
+
+    def render_line(self, item):
+        return dumps_json(item) + b'\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return b''.join(self.render_line(item) for item in items)
@@ -0,0 +1,77 @@
+"""
+Dawlogs_backend/sanitize.py
+Control-character stripping shared by every app's models and views
+(PostgreSQL text columns reject NUL bytes)
+"""
+
+import re
+
+# C0 control characters other than tab, newline and carriage return; re.sub
+# hands back the original string untouched when none are present
+CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def sanitize_text(text):
+    """Remove null characters and other problematic characters from text (falsy values pass through)"""
+    if not text:
+        return text
+    return CONTROL_CHARS_RE.sub('', text)
+
+
+def sanitize_string(s):
+    """Remove null characters and other problematic characters (non-strings pass through)"""
+    if not isinstance(s, str):
+        return s
+    return CONTROL_CHARS_RE.sub('', s)
+
+
+def sanitize_dict(data):
+    """
+    Sanitize every string in nested dicts/lists
+    Walks them with an explicit stack and returns a copy;
+    non-string scalars are passed through without a call per value
+    """
+    if isinstance(data, str):
+        return CONTROL_CHARS_RE.sub('', data)
+    if not isinstance(data, (dict, list)):
+        return data
+
+    root = {} if isinstance(data, dict) else [None] * len(data)
+    stack = [(data, root)]
+    while stack:
+        source, target = stack.pop()
+        for key, value in (source.items() if isinstance(source, dict) else enumerate(source)):
+            if isinstance(value, str):
+                value = CONTROL_CHARS_RE.sub('', value)
+            elif isinstance(value, (dict, list)):
+                copy = {} if isinstance(value, dict) else [None] * len(value)
+                stack.append((value, copy))
+                value = copy
+            target[key] = value
+    return root
+
+
+def sanitize_dict_in_place(data):
+    """
+    sanitize_dict() for payloads built fresh per request (serializer output,
+    parsed request data): strings are cleaned where they sit instead of
+    copying the containers; only strings that actually change are written back
+    Returns data itself (or the cleaned string)
+    """
+    if isinstance(data, str):
+        return CONTROL_CHARS_RE.sub('', data)
+    if not isinstance(data, (dict, list)):
+        return data
+
+    strip = CONTROL_CHARS_RE.sub
+    stack = [data]
+    while stack:
+        container = stack.pop()
+        for key, value in (container.items() if isinstance(container, dict) else enumerate(container)):
+            if isinstance(value, str):
+                cleaned = strip('', value)
+                if cleaned is not value:
+                    container[key] = cleaned
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+    return data
@@ -87,6 +87,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Shared cache: member roles, version file lists and recent download ids are
+# invalidated by signals, which only reach every web/worker process when the
+# cache is shared (the default LocMemCache is per process)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }
+}
+
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
@@ -95,10 +105,40 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'  # Or your timezone
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes max
+# Views publish tasks inside the request: publishes reuse pooled broker
+# connections, and an unreachable broker fails the request quickly (the views
+# mark the push/download failed) instead of stalling it through retries
+CELERY_BROKER_POOL_LIMIT = 10
+CELERY_BROKER_CONNECTION_TIMEOUT = 2
+CELERY_TASK_PUBLISH_RETRY_POLICY = {
+    'max_retries': 1,
+    'interval_start': 0,
+    'interval_step': 0.2,
+    'interval_max': 0.2,
+}
+# Push processing and ZIP builds are long-running: they get their own queue so
+# a backlog of them never delays the short cleanup/beat tasks on 'celery'
+# (workers consume both: celery -A Dawlogs_backend worker -Q celery,transfers)
+CELERY_TASK_ROUTES = {
+    'versions.tasks.process_pending_push_new': {'queue': 'transfers'},
+    'versions.download_tasks.create_download_zip': {'queue': 'transfers'},
+}
 CORS_ALLOW_ALL_ORIGINS = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Deflate level for version download ZIPs (1 = fastest; DAW audio barely
+# compresses further at higher levels)
+VERSION_ZIP_COMPRESSLEVEL = 1
+
+# When nginx serves MEDIA_ROOT from an internal location, set this to that
+# location (e.g. '/protected/') and download ZIPs are handed to nginx via
+# X-Accel-Redirect instead of streamed through the app worker
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = None
+# Behind Apache (mod_xsendfile) or lighttpd, set True to hand download ZIPs
+# over with an X-Sendfile header carrying the file's absolute path instead
+DOWNLOAD_X_SENDFILE = False
+
 ROOT_URLCONF = 'Dawlogs_backend.urls'
 
 TEMPLATES = [
@@ -159,7 +199,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'Dawlogs_backend.renderers.OrjsonRenderer',  # orjson when installed, else stdlib json
         'rest_framework.renderers.BrowsableAPIRenderer',  # Remove in production for security
     ],
 }
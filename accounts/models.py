@@ -7,13 +7,7 @@ Handles user accounts, API keys, and profile information
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.crypto import get_random_string
-
-
-def sanitize_text(text):
-    """Remove null characters and other problematic characters from text"""
-    if not text:
-        return text
-    return ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+from Dawlogs_backend.sanitize import sanitize_text
 
 
 class UserProfile(models.Model):
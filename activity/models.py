@@ -7,13 +7,7 @@ Tracks all project activities and changes
 from django.db import models
 from django.contrib.auth.models import User
 from projects.models import Project
-
-
-def sanitize_text(text):
-    """Remove null characters and other problematic characters from text"""
-    if not text:
-        return text
-    return ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+from Dawlogs_backend.sanitize import sanitize_text
 
 
 class ActivityLog(models.Model):
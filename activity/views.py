@@ -14,25 +14,7 @@ from projects.models import Project
 from projects.permissions import CanViewProject
 from .models import ActivityLog
 from .serializers import ActivityLogSerializer, ActivityLogListSerializer
-
-
-def sanitize_string(s):
-    """Remove null characters and other problematic characters"""
-    if not isinstance(s, str):
-        return s
-    return ''.join(char for char in s if ord(char) >= 32 or char in '\n\r\t')
-
-
-def sanitize_dict(data):
-    """Recursively sanitize all strings in a dictionary"""
-    if isinstance(data, dict):
-        return {k: sanitize_dict(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_dict(item) for item in data]
-    elif isinstance(data, str):
-        return sanitize_string(data)
-    else:
-        return data
+from Dawlogs_backend.sanitize import sanitize_string, sanitize_dict
 
 
 # ============================================================================
@@ -65,7 +47,7 @@ class ProjectActivityLogView(APIView):
         if action_filter:
             logs = logs.filter(action=action_filter)
         
-        logs = logs[:limit]
+        logs = list(logs[:limit])
         
         serializer = ActivityLogListSerializer(
             logs,
@@ -76,7 +58,7 @@ class ProjectActivityLogView(APIView):
         return Response(sanitize_dict({
             'project_id': project.id,
             'project_name': project.name,
-            'log_count': logs.count(),
+            'log_count': len(logs),
             'activities': serializer.data
         }))
 
@@ -96,7 +78,7 @@ class UserActivityLogView(APIView):
         except ValueError:
             limit = 50
         
-        logs = ActivityLog.objects.filter(user=request.user)[:limit]
+        logs = list(ActivityLog.objects.filter(user=request.user)[:limit])
         
         serializer = ActivityLogSerializer(
             logs,
@@ -107,7 +89,7 @@ class UserActivityLogView(APIView):
         return Response(sanitize_dict({
             'user_id': request.user.id,
             'username': request.user.username,
-            'log_count': logs.count(),
+            'log_count': len(logs),
             'activities': serializer.data
         }))
 
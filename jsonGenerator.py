@@ -4,10 +4,12 @@ import json
 
 def compute_file_hash(file_path):
     """Compute SHA256 hash of a file"""
-    sha256 = hashlib.sha256()
     try:
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+        with open(file_path, 'rb', buffering=0) as f:
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+            sha256 = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
                 sha256.update(chunk)
         return sha256.hexdigest()
     except Exception as e:
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-16 14:02
+
+from django.db import migrations, models
+
+
+def backfill_completed_version_count(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    Version = apps.get_model('versions', 'Version')
+    counts = (
+        Version.objects.filter(status='completed').order_by()
+        .values_list('project').annotate(n=models.Count('id'))
+    )
+    for project_id, count in counts:
+        Project.objects.filter(pk=project_id).update(completed_version_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('versions', '0006_downloadrequest_versions_do_version_04571a_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='completed_version_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_completed_version_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-16 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_project_completed_version_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='versions_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
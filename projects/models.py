@@ -5,14 +5,22 @@ Project models with UUID support and proper security
 
 import uuid
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from Dawlogs_backend.sanitize import sanitize_text
 
 
-def sanitize_text(text):
-    """Remove null characters"""
-    if not text:
-        return text
-    return ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+# Member roles are kept briefly in the Django cache so status polling by
+# collaborators does not look the membership up on every request; member
+# saves/deletes drop the entry (settings.CACHES is shared Redis, so every
+# process sees the drop)
+MEMBER_ROLE_CACHE_SECONDS = 60
+
+
+def member_role_cache_key(project_id, user_id):
+    return f'project_role:{project_id}:{user_id}'
 
 
 class Project(models.Model):
@@ -31,6 +39,12 @@ class Project(models.Model):
     
     require_push_approval = models.BooleanField(default=False)
     ignore_patterns = models.JSONField(default=list, blank=True)
+    
+    # Kept in step by the Version save/delete signals (versions.models), so
+    # project lists do not run a COUNT per project
+    completed_version_count = models.PositiveIntegerField(default=0, editable=False)
+    # Stamped by the same signals on any version change; the versions list ETag
+    versions_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-updated_at']
@@ -56,8 +70,8 @@ class Project(models.Model):
         return f"{self.owner.username}/{self.name} (UID:{self.uid[:8]})"
     
     def get_version_count(self):
-        """Get total completed versions"""
-        return self.versions_new.filter(status='completed').count()
+        """Get total completed versions (denormalized counter)"""
+        return self.completed_version_count
     
     def get_latest_version(self):
         """Get most recent completed version"""
@@ -70,14 +84,36 @@ class Project(models.Model):
         ).exists()
     
     def get_user_role(self, user):
-        """Get user role in project"""
-        if user == self.owner:
+        """
+        Get user role in project
+        Ownership is checked on owner_id (no owner fetch); a member role is
+        read from prefetched members_new when present, otherwise with one
+        query, and remembered on this instance for later permission checks
+        """
+        if user.pk is None:
+            return None
+        if user.pk == self.owner_id:
             return 'owner'
         
-        member = self.members_new.filter(user=user).first()
-        if member:
-            return member.role
-        return None
+        roles = self.__dict__.setdefault('_member_roles', {})
+        if user.pk not in roles:
+            prefetched = getattr(self, '_prefetched_objects_cache', {}).get('members_new')
+            if prefetched is not None:
+                roles[user.pk] = next(
+                    (member.role for member in prefetched if member.user_id == user.pk), None
+                )
+            else:
+                roles[user.pk] = self._get_cached_member_role(user.pk)
+        return roles[user.pk]
+    
+    def _get_cached_member_role(self, user_id):
+        """Member role from the Django cache, else one query ('' caches "not a member")"""
+        key = member_role_cache_key(self.pk, user_id)
+        role = cache.get(key)
+        if role is None:
+            role = self.members_new.filter(user_id=user_id).values_list('role', flat=True).first() or ''
+            cache.set(key, role, MEMBER_ROLE_CACHE_SECONDS)
+        return role or None
     
     def user_can_edit(self, user):
         """Check edit permission"""
@@ -124,4 +160,11 @@ class ProjectMember(models.Model):
         db_table = 'projects_projectmember'
     
     def __str__(self):
-        return f"{self.user.username} - {self.role} on {self.project}"
\ No newline at end of file
+        return f"{self.user.username} - {self.role} on {self.project}"
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def forget_member_role(sender, instance, **kwargs):
+    """Drop the cached role when a membership changes"""
+    cache.delete(member_role_cache_key(instance.project_id, instance.user_id))
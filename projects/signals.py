@@ -8,6 +8,7 @@ ULTIMATE FIX: Handles ALL possible path formats
 """
 
 import os
+import re
 import shutil
 from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
@@ -15,12 +16,16 @@ from django.conf import settings
 from .models import Project, ProjectMember
 
 
+# Anything but letters, digits, '-' and '_' (\w matches exactly what str.isalnum
+# accepts, plus '_')
+UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w-]')
+
+
 def sanitize_filename(name):
     """Sanitize filename/folder name"""
     if not name:
         return 'unknown'
-    name = ''.join(char if char.isalnum() or char in '-_' else '_' for char in name)
-    return name[:50]
+    return UNSAFE_FILENAME_CHARS_RE.sub('_', name[:50])
 
 
 def get_all_possible_project_paths(project):
@@ -100,19 +105,31 @@ def get_all_possible_project_paths(project):
 
 
 def get_directory_size(directory):
-    """Calculate total directory size in bytes"""
+    """
+    Calculate total directory size in bytes, with file and subdirectory counts
+    One os.scandir pass; only regular files are stat'ed
+    Returns (total_size, file_count, dir_count)
+    """
     total_size = 0
     file_count = 0
-    for root, dirs, files in os.walk(directory):
-        for f in files:
-            try:
-                fp = os.path.join(root, f)
-                if os.path.exists(fp):
-                    total_size += os.path.getsize(fp)
-                    file_count += 1
-            except Exception:
-                continue
-    return total_size, file_count
+    dir_count = 0
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            dir_count += 1
+                        elif entry.is_file(follow_symlinks=False):
+                            total_size += entry.stat(follow_symlinks=False).st_size
+                            file_count += 1
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total_size, file_count, dir_count
 
 
 def cleanup_empty_parent_directories(username, user_id=None):
@@ -237,17 +254,18 @@ def cleanup_project_relations(sender, instance, **kwargs):
                 other_projects_count = other_project_refs.values('project').distinct().count()
                 
                 if other_projects_count > 0:
-                    other_projects = other_project_refs.select_related(
-                        'project', 'project__owner'
-                    ).distinct('project')[:5]
+                    # Plain dict rows (one per project) - no Project/User instances
+                    other_projects = other_project_refs.values(
+                        'project__owner__username', 'project__owner__id',
+                        'project__name', 'project__uid'
+                    ).distinct().order_by('project__name')[:5]
                     
-                    project_names = []
-                    for ref in other_projects:
-                        username = ref.project.owner.username if ref.project.owner else 'Unknown'
-                        user_id = ref.project.owner.id if ref.project.owner else 'N/A'
-                        project_name = ref.project.name
-                        project_uid = ref.project.uid[:8]
-                        project_names.append(f"{username}_{user_id}:{project_name}_{project_uid}")
+                    project_names = [
+                        f"{row['project__owner__username'] or 'Unknown'}_"
+                        f"{row['project__owner__id'] or 'N/A'}:"
+                        f"{row['project__name']}_{row['project__uid'][:8]}"
+                        for row in other_projects
+                    ]
                     
                     more_text = f" (+{other_projects_count - len(project_names)} more)" if other_projects_count > len(project_names) else ""
                     
@@ -391,10 +409,7 @@ def cleanup_project_directories(sender, instance, **kwargs):
         if os.path.exists(path):
             try:
                 # Get directory stats before deletion
-                dir_size, file_count = get_directory_size(path)
-                
-                # Count subdirectories
-                subdir_count = sum([len(dirs) for _, dirs, _ in os.walk(path)])
+                dir_size, file_count, subdir_count = get_directory_size(path)
                 
                 print(f"[DELETING - {path_type}] {path}")
                 print(f"           Files: {file_count} | Subdirs: {subdir_count} | Size: {round(dir_size / (1024 * 1024), 2)} MB")
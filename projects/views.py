@@ -25,25 +25,7 @@ from .serializers import (
     ProjectMemberSerializer,
     ProjectStatusSerializer
 )
-
-
-def sanitize_string(s):
-    """Remove null characters"""
-    if not isinstance(s, str):
-        return s
-    return ''.join(char for char in s if ord(char) >= 32 or char in '\n\r\t')
-
-
-def sanitize_dict(data):
-    """Recursively sanitize strings"""
-    if isinstance(data, dict):
-        return {k: sanitize_dict(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_dict(item) for item in data]
-    elif isinstance(data, str):
-        return sanitize_string(data)
-    else:
-        return data
+from Dawlogs_backend.sanitize import sanitize_string, sanitize_dict
 
 
 def get_project_or_404(uid_or_id, user):
@@ -13,7 +13,7 @@ REM ----------------------------
 REM Start Celery worker
 REM ----------------------------
 echo Starting Celery worker...
-start "Celery Worker" cmd /k "celery -A Dawlogs_backend worker --loglevel=info --pool=solo"
+start "Celery Worker" cmd /k "celery -A Dawlogs_backend worker -Q celery,transfers --loglevel=info --pool=solo"
 
 REM ----------------------------
 REM Start Django development server
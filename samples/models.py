@@ -5,13 +5,7 @@ from django.contrib.auth.models import User
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 from projects.models import Project
-
-
-def sanitize_text(text):
-    """Remove null characters and other problematic characters from text"""
-    if not text:
-        return text
-    return ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+from Dawlogs_backend.sanitize import sanitize_text
 
 
 def sample_upload_path(instance, filename):
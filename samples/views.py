@@ -14,23 +14,7 @@ from .serializers import (
     SampleBasketUpdateSerializer,
     SampleBasketListSerializer
 )
-
-
-def sanitize_string(s):
-    if not isinstance(s, str):
-        return s
-    return ''.join(char for char in s if ord(char) >= 32 or char in '\n\r\t')
-
-
-def sanitize_dict(data):
-    if isinstance(data, dict):
-        return {k: sanitize_dict(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_dict(item) for item in data]
-    elif isinstance(data, str):
-        return sanitize_string(data)
-    else:
-        return data
+from Dawlogs_backend.sanitize import sanitize_string, sanitize_dict
 
 
 # ====================================================================
@@ -48,13 +32,13 @@ class SampleBasketView(APIView):
         project = get_object_or_404(Project, uid=project_uid)
         self.check_object_permissions(request, project)
         
-        samples = project.samples_new.all().order_by('-uploaded_at')
+        samples = list(project.samples_new.all().order_by('-uploaded_at'))
         serializer = SampleBasketListSerializer(samples, many=True, context={'request': request})
         
         return Response(sanitize_dict({
             'project_uid': project.uid,
             'project_name': project.name,
-            'sample_count': samples.count(),
+            'sample_count': len(samples),
             'samples': serializer.data
         }))
     
@@ -12,13 +12,7 @@ from django.contrib.auth.models import User
 from django.db import IntegrityError
 from .models import UserProfile
 import re
-
-
-def sanitize_string(s):
-    """Remove null characters and other problematic characters"""
-    if not isinstance(s, str):
-        return s
-    return ''.join(char for char in s if ord(char) >= 32 or char in '\n\r\t')
+from Dawlogs_backend.sanitize import sanitize_string
 
 
 def validate_email(email):
@@ -1,12 +1,6 @@
 from django.core.management.base import BaseCommand
 from versioning.models import Project, Version, PendingPush
-
-
-def sanitize_text(text):
-    """Remove null characters and other problematic characters"""
-    if not text:
-        return text
-    return ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+from Dawlogs_backend.sanitize import sanitize_text
 
 
 def clean_dict(data):
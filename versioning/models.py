@@ -6,6 +6,7 @@ from django.core.validators import RegexValidator
 from django.utils.crypto import get_random_string
 import os
 import json
+from Dawlogs_backend.sanitize import sanitize_text
 
 def project_upload_path(instance, filename):
     return os.path.join('projects', instance.project.owner.username, instance.project.name, filename)
@@ -13,12 +14,6 @@ def project_upload_path(instance, filename):
 def sample_upload_path(instance, filename):
     return os.path.join('samples', instance.project.owner.username, instance.project.name, filename)
 
-def sanitize_text(text):
-    """Remove null characters and other problematic characters from text"""
-    if not text:
-        return text
-    return ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
-
 
 class UserProfile(models.Model):
     """Extended user profile with API key"""
@@ -3,21 +3,29 @@
 import os
 import hashlib
 import zipfile
-import shutil
-import fnmatch
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from celery import shared_task
 from django.conf import settings
 from .models import PendingPush, Version
+from versions.restore_utils import fast_copy_file, iter_tree_files
+from versions.tasks import (
+    prune_master_dir, compile_ignore_patterns, should_ignore_file as _should_ignore_file
+)
 from django.utils import timezone
 import json
 import re
 
+# Pushes copy files on a thread pool; the copies are I/O-bound
+COPY_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
 
 def compute_file_hash(file_path):
     """Compute SHA256 hash of a file"""
-    sha256 = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
+    with open(file_path, 'rb', buffering=0) as f:
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        sha256 = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
             sha256.update(chunk)
     return sha256.hexdigest()
 
@@ -45,17 +53,12 @@ def get_next_version_number(project):
 
 
 def should_ignore_file(rel_path, ignore_patterns):
-    """Check if file should be ignored based on patterns"""
-    for pattern in ignore_patterns:
-        if fnmatch.fnmatch(rel_path, pattern):
-            return True
-        # Also check if any parent directory matches
-        path_parts = rel_path.split('/')
-        for i in range(len(path_parts)):
-            partial_path = '/'.join(path_parts[:i+1])
-            if fnmatch.fnmatch(partial_path, pattern):
-                return True
-    return False
+    """
+    Check if file should be ignored based on patterns
+    A pattern matching the path or any parent directory ignores it;
+    ignore_patterns may be a list or a compile_ignore_patterns() regex
+    """
+    return _should_ignore_file(rel_path, ignore_patterns)
 
 
 @shared_task(bind=True)
@@ -89,6 +92,7 @@ def process_pending_push(self, push_id):
         # Apply ignore patterns
         ignore_patterns = project.ignore_patterns or []
         if ignore_patterns:
+            ignore_patterns = compile_ignore_patterns(ignore_patterns)
             filtered_list = []
             ignored_count = 0
             for f in file_list:
@@ -123,68 +127,55 @@ def process_pending_push(self, push_id):
         copied_count = 0
         skipped_count = 0
 
-        # Copy only changed/new files
-        for idx, f in enumerate(file_list, start=1):
+        def _process_one(f):
+            """Copy one file unless the master already has it; returns (used_existing, copied)"""
             local_path = f.get('local_path')
             rel_path = f.get('relative_path')
             expected_hash = f.get('hash')
 
-            if not rel_path:
-                continue
-
             dest_path = os.path.join(master_dir, rel_path)
             os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
-            use_existing = False
-            if os.path.exists(dest_path):
+            if expected_hash and os.path.exists(dest_path):
                 try:
-                    current_hash = compute_file_hash(dest_path)
-                    if expected_hash and current_hash == expected_hash:
-                        use_existing = True
-                        skipped_count += 1
+                    if compute_file_hash(dest_path) == expected_hash:
+                        return True, False
                 except Exception:
                     pass
 
-            if not use_existing and local_path and os.path.exists(local_path):
+            if local_path and os.path.exists(local_path):
                 try:
-                    shutil.copy2(local_path, dest_path)
-                    copied_count += 1
+                    fast_copy_file(local_path, dest_path, preserve_stat=True)
+                    return False, True
                 except Exception as e:
                     print(f"Error copying file {local_path}: {str(e)}")
+            return False, False
+
+        # Copy only changed/new files; the work is I/O-bound, so files are
+        # processed on a thread pool and progress is saved every 1%
+        jobs = [f for f in file_list if f.get('relative_path')]
+        progress_every = max(1, min(50, total_files // 100))
+        with ThreadPoolExecutor(max_workers=max(1, min(COPY_MAX_WORKERS, len(jobs)))) as executor:
+            futures = [executor.submit(_process_one, f) for f in jobs]
+            for idx, future in enumerate(as_completed(futures), start=1):
+                used_existing, copied = future.result()
+                skipped_count += used_existing
+                copied_count += copied
+
+                if idx % progress_every and idx != len(futures):
+                    continue
+                progress_pct = 15 + int((idx / total_files) * 35)
+                update_push_progress(
+                    push, 
+                    'processing', 
+                    progress_pct, 
+                    f"Processed {idx}/{total_files} files"
+                )
 
-            progress_pct = 15 + int((idx / total_files) * 35)
-            update_push_progress(
-                push, 
-                'processing', 
-                progress_pct, 
-                f"Processed {idx}/{total_files} files"
-            )
-
-        # Remove files not in incoming file_list
-        incoming_set = set([f.get('relative_path') for f in file_list if f.get('relative_path')])
-        removed_count = 0
-        
-        for root, dirs, files in os.walk(master_dir):
-            for fname in files:
-                full_path = os.path.join(root, fname)
-                rel = os.path.relpath(full_path, master_dir).replace('\\', '/')
-                
-                if rel not in incoming_set:
-                    try:
-                        os.remove(full_path)
-                        removed_count += 1
-                    except Exception as e:
-                        print(f"Error removing file {full_path}: {str(e)}")
-
-        # Remove empty directories
-        for root, dirs, files in os.walk(master_dir, topdown=False):
-            for dir_name in dirs:
-                dir_path = os.path.join(root, dir_name)
-                try:
-                    if not os.listdir(dir_path):
-                        os.rmdir(dir_path)
-                except Exception:
-                    pass
+        # Remove files not in incoming file_list, and the directories that
+        # leaves empty, in one scandir pass
+        incoming_set = frozenset(f.get('relative_path') for f in file_list if f.get('relative_path'))
+        removed_count = prune_master_dir(master_dir, incoming_set)
 
         update_push_progress(
             push, 
@@ -208,11 +199,8 @@ def process_pending_push(self, push_id):
         update_push_progress(push, 'zipping', 60, "Creating zip archive...")
         
         with zipfile.ZipFile(zip_full_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(master_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, master_dir)
-                    zipf.write(file_path, arcname)
+            for arcname, file_path in iter_tree_files(master_dir):
+                zipf.write(file_path, arcname)
 
         # Get file statistics
         file_size = os.path.getsize(zip_full_path)
@@ -6,7 +6,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models import Count, Exists, OuterRef, Q, Value
 from django.contrib.auth.models import User
 from .models import (
     UserProfile, Project, ProjectMember, Version, 
@@ -20,26 +20,10 @@ from .serializers import (
 from .permissions import IsProjectOwner, CanViewProject, CanEditProject
 from .authentication import APIKeyAuthentication
 from .tasks import process_pending_push
+from versions.tasks import compile_ignore_patterns
+import os
 import json
-
-
-def sanitize_string(s):
-    """Remove null characters and other problematic characters"""
-    if not isinstance(s, str):
-        return s
-    return ''.join(char for char in s if ord(char) >= 32 or char in '\n\r\t')
-
-
-def sanitize_dict(data):
-    """Recursively sanitize all strings in a dictionary"""
-    if isinstance(data, dict):
-        return {k: sanitize_dict(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_dict(item) for item in data]
-    elif isinstance(data, str):
-        return sanitize_string(data)
-    else:
-        return data
+from Dawlogs_backend.sanitize import sanitize_string, sanitize_dict
 
 
 # ============================================================================
@@ -297,12 +281,12 @@ class VersionUploadView(APIView):
         
         file_list = sanitize_dict(file_list)
         
-        try:
-            project = Project.objects.get(
-                Q(owner=request.user) | Q(members__user=request.user),
-                name=project_name
-            )
-        except Project.DoesNotExist:
+        # Owned and shared projects in one UNION ALL (owned first) rather
+        # than an OR across the members join
+        owned = Project.objects.filter(owner=request.user, name=project_name).annotate(owned=Value(1)).order_by()
+        shared = Project.objects.filter(members__user=request.user, name=project_name).annotate(owned=Value(0)).order_by()
+        project = owned.union(shared, all=True).order_by('-owned').first()
+        if project is None:
             project = Project.objects.create(owner=request.user, name=project_name)
         
         if not project.user_can_edit(request.user):
@@ -313,20 +297,11 @@ class VersionUploadView(APIView):
         
         # Filter files based on ignore patterns
         if project.ignore_patterns:
-            filtered_file_list = []
-            for file_entry in file_list:
-                rel_path = file_entry.get('relative_path', '')
-                should_ignore = False
-                
-                for pattern in project.ignore_patterns:
-                    if self._matches_pattern(rel_path, pattern):
-                        should_ignore = True
-                        break
-                
-                if not should_ignore:
-                    filtered_file_list.append(file_entry)
-            
-            file_list = filtered_file_list
+            ignore_re = compile_ignore_patterns(project.ignore_patterns, whole_path=True)
+            file_list = [
+                file_entry for file_entry in file_list
+                if not ignore_re.match(os.path.normcase(file_entry.get('relative_path', '')))
+            ]
         
         version = Version.objects.create(
             project=project,
@@ -368,11 +343,6 @@ class VersionUploadView(APIView):
             'status': initial_status,
             'requires_approval': initial_status == 'awaiting_approval'
         }), status=status.HTTP_201_CREATED)
-    
-    @staticmethod
-    def _matches_pattern(path, pattern):
-        import fnmatch
-        return fnmatch.fnmatch(path, pattern)
 
 
 class ProjectVersionsView(APIView):
@@ -384,13 +354,13 @@ class ProjectVersionsView(APIView):
         project = get_object_or_404(Project, id=project_id)
         self.check_object_permissions(request, project)
         
-        versions = project.versions.all().order_by('-created_at')
+        versions = list(project.versions.all().order_by('-created_at'))
         serializer = VersionSerializer(versions, many=True, context={'request': request})
         
         return Response(sanitize_dict({
             'project_id': project.id,
             'project_name': project.name,
-            'version_count': versions.count(),
+            'version_count': len(versions),
             'versions': serializer.data
         }))
 
@@ -637,13 +607,13 @@ class SampleBasketView(APIView):
         project = get_object_or_404(Project, id=project_id)
         self.check_object_permissions(request, project)
         
-        samples = project.samples.all().order_by('-uploaded_at')
+        samples = list(project.samples.all().order_by('-uploaded_at'))
         serializer = SampleBasketSerializer(samples, many=True, context={'request': request})
         
         return Response(sanitize_dict({
             'project_id': project.id,
             'project_name': project.name,
-            'sample_count': samples.count(),
+            'sample_count': len(samples),
             'samples': serializer.data
         }))
     
@@ -14,4 +14,5 @@ class VersionsConfig(AppConfig):
     def ready(self):
         """Import signals when app is ready"""
         import versions.signals
-        import versions.download_tasks
\ No newline at end of file
+        import versions.download_tasks
+        import versions.cleanup_tasks
\ No newline at end of file
@@ -0,0 +1,281 @@
+"""
+versions/cleanup_tasks.py
+Celery tasks for storage cleanup after Project/Version/FileBlob/DownloadRequest/PendingPush deletion
+Delete signals only collect paths and IDs - the disk I/O happens here
+Rejected/cancelled pushes hand their version deletion over as well
+"""
+
+import os
+import shutil
+import time
+import logging
+from collections import Counter
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# Files younger than this are never reaped (they may belong to a row that
+# has not been committed yet)
+ORPHAN_MIN_AGE_SECONDS = 60 * 60
+
+
+def schedule_cleanup(task, *args):
+    """
+    Queue a cleanup task once the surrounding transaction commits
+    Falls back to running inline if the broker is unavailable
+    """
+    def _dispatch():
+        try:
+            task.delay(*args)
+        except Exception as e:
+            logger.warning("Could not queue %s (%s), running inline", task.name, e)
+            task(*args)
+
+    transaction.on_commit(_dispatch)
+
+
+def _remove_dir_if_empty(path):
+    """Remove a directory if it exists and is empty"""
+    try:
+        if os.path.isdir(path) and not os.listdir(path):
+            os.rmdir(path)
+            return True
+    except OSError:
+        pass
+    return False
+
+
+def get_directory_usage(path):
+    """
+    Count files and bytes under path with os.scandir
+    DirEntry type checks come from readdir, so only regular files are stat'ed
+    Returns (file_count, total_size)
+    """
+    file_count = 0
+    total_size = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total_size += entry.stat(follow_symlinks=False).st_size
+                            file_count += 1
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return file_count, total_size
+
+
+@shared_task
+def cleanup_version_artifacts(version_dir, snapshot_path=None, blob_ids=None):
+    """
+    Remove a deleted version's files and release its CAS blobs
+
+    Args:
+        version_dir: Absolute path of the version directory
+        snapshot_path: Absolute path of the snapshot ZIP (if any)
+        blob_ids: FileBlob IDs listed in the version manifest (one per entry)
+
+    Returns:
+        Status message string
+    """
+    from .models import FileBlob
+
+    if snapshot_path and os.path.isfile(snapshot_path):
+        try:
+            os.remove(snapshot_path)
+            logger.info("Deleted snapshot: %s", snapshot_path)
+        except OSError as e:
+            logger.error("Snapshot deletion failed: %s", e)
+
+    if version_dir and os.path.exists(version_dir):
+        shutil.rmtree(version_dir, ignore_errors=True)
+        logger.info("Deleted version directory: %s", version_dir)
+        _remove_dir_if_empty(os.path.dirname(version_dir))
+
+    released = 0
+    if blob_ids:
+        # Blobs that no other version references any more lose the refs this
+        # version held, in a single UPDATE
+        from .tasks import ref_count_delta
+
+        unreferenced = set(
+            FileBlob.objects.filter(id__in=set(blob_ids), references__isnull=True)
+            .values_list('id', flat=True)
+        )
+        counts = {
+            blob_id: count for blob_id, count in Counter(blob_ids).items()
+            if blob_id in unreferenced
+        }
+        if counts:
+            FileBlob.objects.filter(id__in=counts).update(
+                ref_count=F('ref_count') - ref_count_delta(counts)
+            )
+
+        # Deleting fires fileblob_pre_delete, which schedules the file removal
+        for blob in FileBlob.objects.filter(id__in=unreferenced, ref_count__lte=0):
+            blob.delete()
+            released += 1
+
+    return f"Version artifacts cleaned ({released} blobs released)"
+
+
+@shared_task
+def delete_push_version(version_id):
+    """
+    Delete the version of a rejected or cancelled push
+    Its pre_delete signal reads the manifest and schedules the file cleanup,
+    so none of that runs in the reject/cancel request
+    """
+    from .models import Version
+
+    version = Version.objects.filter(pk=version_id).first()
+    if version is None:
+        return "Version already deleted"
+
+    version.delete()
+    logger.info("Deleted version of rejected/cancelled push: %s", version.uid)
+    return "Version deleted"
+
+
+@shared_task
+def cleanup_blob_file(file_name):
+    """
+    Remove a CAS blob file (and its empty prefix directory)
+    Skipped if another FileBlob row has since claimed the same file name
+    """
+    from .models import FileBlob
+
+    if FileBlob.objects.filter(file=file_name).exists():
+        return "Blob file still in use"
+
+    file_path = os.path.join(settings.MEDIA_ROOT, file_name)
+    if not os.path.isfile(file_path):
+        return "Blob file already removed"
+
+    os.remove(file_path)
+    logger.info("Deleted blob file: %s", file_path)
+    _remove_dir_if_empty(os.path.dirname(file_path))
+    return "Blob file removed"
+
+
+@shared_task
+def cleanup_download_file(file_path):
+    """Remove a download ZIP from storage"""
+    if not os.path.isfile(file_path):
+        return "Download file already removed"
+
+    os.remove(file_path)
+    logger.info("Deleted ZIP: %s", file_path)
+    return "Download file removed"
+
+
+@shared_task
+def cleanup_push_file_list(file_path):
+    """Remove a deleted push's offloaded file list (and its empty pushes directory)"""
+    if not os.path.isfile(file_path):
+        return "Push file list already removed"
+
+    os.remove(file_path)
+    logger.info("Deleted push file list: %s", file_path)
+    _remove_dir_if_empty(os.path.dirname(file_path))
+    return "Push file list removed"
+
+
+@shared_task
+def cleanup_project_directory(project_dir):
+    """
+    Remove a deleted project's storage directory and any parents it leaves empty
+
+    Returns:
+        Status message string
+    """
+    if not os.path.exists(project_dir):
+        return "Project directory already removed"
+
+    file_count, total_size = get_directory_usage(project_dir)
+    shutil.rmtree(project_dir, ignore_errors=True)
+    logger.info(
+        "Deleted project directory: %s (%d files, %s MB)",
+        project_dir, file_count, round(total_size / (1024 * 1024), 2)
+    )
+
+    # users/<user>/projects, then users/<user>
+    projects_dir = os.path.dirname(project_dir)
+    if _remove_dir_if_empty(projects_dir):
+        _remove_dir_if_empty(os.path.dirname(projects_dir))
+
+    return f"Project directory removed ({file_count} files)"
+
+
+@shared_task
+def reap_orphaned_storage():
+    """
+    Periodic sweep for files whose rows are gone but whose cleanup task never ran
+    Covers CAS blob files, download ZIPs and abandoned ZIP build directories
+    Run every few hours via Celery Beat
+
+    Returns:
+        Status message string
+    """
+    from .models import FileBlob, DownloadRequest, DOWNLOAD_BUILD_DIR_PREFIX
+
+    media_root = str(settings.MEDIA_ROOT)
+    cutoff = time.time() - ORPHAN_MIN_AGE_SECONDS
+    removed = 0
+
+    # CAS blobs: cas_blobs/<prefix>/<name>
+    blob_root = os.path.join(media_root, 'cas_blobs')
+    if os.path.isdir(blob_root):
+        for prefix_entry in os.scandir(blob_root):
+            if not prefix_entry.is_dir():
+                continue
+            known = set(
+                FileBlob.objects.filter(file__startswith=f'cas_blobs/{prefix_entry.name}/')
+                .values_list('file', flat=True)
+            )
+            for entry in os.scandir(prefix_entry.path):
+                name = f'cas_blobs/{prefix_entry.name}/{entry.name}'
+                if entry.is_file() and name not in known and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            _remove_dir_if_empty(prefix_entry.path)
+
+    # Download ZIPs: users/<user>/projects/<uid>/downloads/<name>.zip
+    users_root = os.path.join(media_root, 'users')
+    if os.path.isdir(users_root):
+        known = set(
+            DownloadRequest.objects.exclude(zip_file='').exclude(zip_file__isnull=True)
+            .values_list('zip_file', flat=True)
+        )
+        for user_entry in os.scandir(users_root):
+            projects_dir = os.path.join(user_entry.path, 'projects')
+            if not os.path.isdir(projects_dir):
+                continue
+            for project_entry in os.scandir(projects_dir):
+                downloads_dir = os.path.join(project_entry.path, 'downloads')
+                if not os.path.isdir(downloads_dir):
+                    continue
+                for entry in os.scandir(downloads_dir):
+                    if entry.is_dir() and entry.name.startswith(DOWNLOAD_BUILD_DIR_PREFIX):
+                        # Scratch directory of a ZIP build whose worker died
+                        if entry.stat().st_mtime < cutoff:
+                            shutil.rmtree(entry.path, ignore_errors=True)
+                            removed += 1
+                        continue
+                    name = os.path.relpath(entry.path, media_root).replace('\\', '/')
+                    if entry.is_file() and name not in known and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+
+    message = f"Reaped {removed} orphaned files"
+    logger.info(message)
+    return message
@@ -6,11 +6,18 @@ UPDATED: Added automatic cleanup of expired downloads
 
 import os
 import tempfile
-import zipfile
 from celery import shared_task
 from django.conf import settings
-from .models import DownloadRequest, Version, get_version_storage_path
-from .restore_utils import restore_version_to_directory
+from .models import (
+    DownloadRequest,
+    Version,
+    get_version_storage_path,
+    download_zip_path,
+    DOWNLOAD_BUILD_DIR_PREFIX
+)
+from .restore_utils import (
+    restore_version_to_directory, write_zip_parallel, fast_copy_file, iter_tree_files
+)
 
 
 def update_download_progress(download: DownloadRequest, progress: int, message: str):
@@ -27,7 +34,7 @@ def update_download_progress(download: DownloadRequest, progress: int, message:
     download.save(update_fields=['progress', 'message'])
 
 
-@shared_task(bind=True)
+@shared_task(bind=True, ignore_result=True)
 def create_download_zip(self, download_id):
     """
     Create a temporary ZIP file for download
@@ -43,6 +50,7 @@ def create_download_zip(self, download_id):
         download = DownloadRequest.objects.select_related(
             'version', 
             'version__project', 
+            'version__project__owner',
             'requested_by'
         ).get(id=download_id)
         
@@ -58,8 +66,13 @@ def create_download_zip(self, download_id):
         
         update_download_progress(download, 5, "Initializing download preparation...")
         
-        # Create temp directory
-        temp_dir = tempfile.mkdtemp(prefix='dawlogs_download_')
+        # Create temp directory next to the final ZIP (same filesystem, so
+        # mark_completed hardlinks it instead of copying it out of /tmp)
+        downloads_dir = download.zip_file.storage.path(
+            os.path.dirname(download_zip_path(download, 'download.zip'))
+        )
+        os.makedirs(downloads_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix=DOWNLOAD_BUILD_DIR_PREFIX, dir=downloads_dir)
         
         try:
             # If it's a snapshot, copy directly
@@ -74,10 +87,10 @@ def create_download_zip(self, download_id):
                 
                 file_size = os.path.getsize(snapshot_path)
                 
-                # Copy to temp location
+                # Copy to temp location (reflink/in-kernel copy where possible)
                 import shutil
                 temp_zip = os.path.join(temp_dir, 'download.zip')
-                shutil.copy2(snapshot_path, temp_zip)
+                fast_copy_file(snapshot_path, temp_zip)
                 
                 update_download_progress(download, 90, "Finalizing download...")
                 
@@ -135,25 +148,22 @@ def create_download_zip(self, download_id):
             # Create ZIP file
             zip_path = os.path.join(temp_dir, 'download.zip')
             
-            files_zipped = 0
-            total_files = stats['files_restored']
-            
             print(f"Creating ZIP at {zip_path}")
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(restore_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, restore_dir)
-                        zipf.write(file_path, arcname)
-                        
-                        files_zipped += 1
-                        if files_zipped % 10 == 0:
-                            progress = 60 + int((files_zipped / total_files) * 25)
-                            update_download_progress(
-                                download, progress,
-                                f"Compressing files ({files_zipped}/{total_files})..."
-                            )
+            # One sorted listing of the restored tree, then parallel deflate
+            members = sorted(iter_tree_files(restore_dir))
+            
+            def _zip_progress(files_zipped, total):
+                if files_zipped % 10 == 0:
+                    progress = 60 + int((files_zipped / total) * 25)
+                    update_download_progress(
+                        download, progress,
+                        f"Compressing files ({files_zipped}/{total})..."
+                    )
+            
+            zip_errors = write_zip_parallel(zip_path, members, _zip_progress)
+            if zip_errors:
+                raise Exception('; '.join(zip_errors))
             
             file_size = os.path.getsize(zip_path)
             
@@ -0,0 +1,102 @@
+"""
+Management command to store manifest counters on versions created before they existed
+Run this: python manage.py backfill_manifest_counts
+"""
+
+from django.core.management.base import BaseCommand
+from versions.models import Version
+
+
+class Command(BaseCommand):
+    help = 'Backfill manifest file/CAS/inline counters on CAS versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be fixed without making changes',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+
+        # CAS versions whose list summary still needs the manifest file
+        versions_without_counts = Version.objects.filter(
+            manifest_file_count__isnull=True,
+            is_snapshot=False,
+            status='completed'
+        )
+
+        self.stdout.write(f'Found {versions_without_counts.count()} versions without manifest counters')
+
+        fixed_count = 0
+        error_count = 0
+
+        for version in versions_without_counts.iterator():
+            try:
+                manifest = version.load_manifest_from_file()
+
+                if not manifest:
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f'Version {version.id} (v{version.version_number}): '
+                            f'Manifest file not found'
+                        )
+                    )
+                    error_count += 1
+                    continue
+
+                files = manifest.get('files', [])
+                cas_count = 0
+                inline_count = 0
+                total_size = 0
+                for file_entry in files:
+                    storage = file_entry.get('storage')
+                    if storage == 'cas':
+                        cas_count += 1
+                    elif storage == 'inline':
+                        inline_count += 1
+                    total_size += file_entry.get('size', 0)
+
+                if not dry_run:
+                    version.manifest_file_count = len(files)
+                    version.manifest_total_size = total_size
+                    version.manifest_cas_count = cas_count
+                    version.manifest_inline_count = inline_count
+                    version.manifest_cas_threshold_mb = manifest.get('cas_threshold_mb')
+                    version.save(update_fields=[
+                        'manifest_file_count', 'manifest_total_size',
+                        'manifest_cas_count', 'manifest_inline_count',
+                        'manifest_cas_threshold_mb'
+                    ])
+
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'Version {version.id} (v{version.version_number}): '
+                        f'{"Would store" if dry_run else "Stored"} {len(files)} files '
+                        f'({cas_count} CAS, {inline_count} inline)'
+                    )
+                )
+
+                fixed_count += 1
+
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f'Version {version.id}: Error - {str(e)}'
+                    )
+                )
+                error_count += 1
+
+        # Summary
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'Summary:'))
+        self.stdout.write(f'  Fixed: {fixed_count}')
+        self.stdout.write(f'  Errors: {error_count}')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - No changes were made'))
+            self.stdout.write('Run without --dry-run to apply changes')
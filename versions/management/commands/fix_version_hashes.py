@@ -5,10 +5,10 @@ Run this: python manage.py fix_version_hashes
 
 import os
 import json
-import hashlib
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from versions.models import Version
+from versions.tasks import compute_manifest_hash
 
 
 class Command(BaseCommand):
@@ -26,25 +26,6 @@ class Command(BaseCommand):
             help='Recalculate hash even if it already exists',
         )
 
-    def compute_manifest_hash(self, manifest):
-        """Compute hash of manifest for duplicate detection"""
-        files = manifest.get('files', [])
-        file_hashes = []
-        
-        for f in files:
-            file_hashes.append({
-                'path': f.get('path'),
-                'hash': f.get('hash'),
-                'size': f.get('size')
-            })
-        
-        # Sort by path for consistency
-        file_hashes.sort(key=lambda x: x['path'])
-        
-        # Compute hash
-        manifest_str = json.dumps(file_hashes, sort_keys=True)
-        return hashlib.sha256(manifest_str.encode()).hexdigest()
-
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         force = options['force']
@@ -110,7 +91,7 @@ class Command(BaseCommand):
                 with open(manifest_file, 'r', encoding='utf-8') as f:
                     manifest = json.load(f)
                 
-                manifest_hash = self.compute_manifest_hash(manifest)
+                manifest_hash = compute_manifest_hash(manifest)
                 
                 if not dry_run:
                     version.hash = manifest_hash
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-16 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('versions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='fileblob',
+            name='versions_fi_hash_87cd3c_idx',
+        ),
+        migrations.AlterField(
+            model_name='fileblob',
+            name='hash',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-16 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('versions', '0002_remove_fileblob_versions_fi_hash_87cd3c_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='version',
+            name='manifest_cas_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='version',
+            name='manifest_cas_threshold_mb',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='version',
+            name='manifest_file_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='version',
+            name='manifest_inline_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='version',
+            name='manifest_total_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
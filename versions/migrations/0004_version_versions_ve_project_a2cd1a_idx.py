@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-16 12:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('versions', '0003_version_manifest_cas_count_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='version',
+            index=models.Index(fields=['project', 'status', '-created_at'], name='versions_ve_project_a2cd1a_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-16 12:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('versions', '0004_version_versions_ve_project_a2cd1a_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='version',
+            name='versions_ve_project_9ccf70_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='version',
+            name='versions_ve_project_d1cad6_idx',
+        ),
+        migrations.AddIndex(
+            model_name='version',
+            index=models.Index(fields=['project', 'hash', 'status'], name='versions_ve_project_574ba2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='version',
+            index=models.Index(fields=['project', 'status', 'version_number'], name='versions_ve_project_9c6a19_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-16 12:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('versions', '0005_remove_version_versions_ve_project_9ccf70_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='downloadrequest',
+            index=models.Index(fields=['version', 'requested_by', '-created_at'], name='versions_do_version_04571a_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('versions', '0006_downloadrequest_versions_do_version_04571a_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingpush',
+            name='file_list_path',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pendingpush',
+            name='file_list',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 12:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('versions', '0007_pendingpush_file_list_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='downloadrequest',
+            name='versions_do_version_04571a_idx',
+        ),
+        migrations.AddIndex(
+            model_name='downloadrequest',
+            index=models.Index(condition=models.Q(('status__in', ('pending', 'processing', 'completed'))), fields=['version', 'requested_by', '-created_at'], name='versions_do_recent_active_idx'),
+        ),
+    ]
@@ -5,30 +5,44 @@ Path format: media/users/username_userid/projects/projectuid/
 """
 
 import os
+import re
+import gzip
 import shutil
 import json
 import uuid
+import logging
+import functools
 from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import pre_delete, post_delete
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
 from projects.models import Project
+from Dawlogs_backend.sanitize import sanitize_text
 
+# orjson parses/serializes manifests several times faster; optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def sanitize_text(text):
-    """Remove null characters and other problematic characters from text"""
-    if not text:
-        return text
-    return ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
+logger = logging.getLogger(__name__)
+
+
+# Anything but letters, digits, '-' and '_' (\w matches exactly what str.isalnum
+# accepts, plus '_')
+UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w-]')
 
 
 def sanitize_filename(name):
     """Sanitize filename/folder name - remove problematic characters"""
     if not name:
         return 'unknown'
-    name = ''.join(char if char.isalnum() or char in '-_' else '_' for char in name)
-    return name[:50]
+    return UNSAFE_FILENAME_CHARS_RE.sub('_', name[:50])
 
 
 def get_user_storage_path(user_id, username):
@@ -83,6 +97,68 @@ def get_manifest_path(user_id, username, project_id, project_name, project_uid,
     return os.path.join(version_dir, 'manifest.json')
 
 
+# Parsed manifests are cached per worker process, keyed on (path, mtime, size)
+# so a rewritten manifest is never served stale. Large manifests (older
+# ones embed inline files as base64) are not cached to keep worker memory bounded.
+MANIFEST_CACHE_SIZE = 128
+MANIFEST_CACHE_MAX_BYTES = 4 * 1024 * 1024
+# Summaries of completed legacy manifests (no stored counters) live in the
+# Django cache
+MANIFEST_SUMMARY_CACHE_SECONDS = 60 * 60
+# File browser listings of completed versions, also in the Django cache
+FILE_LIST_CACHE_SECONDS = getattr(settings, 'VERSION_FILE_LIST_CACHE_SECONDS', 24 * 60 * 60)
+# Raw bytes of a CAS version's inline files, concatenated next to its manifest
+INLINE_PACK_FILENAME = 'inline.pack'
+# Push file lists longer than this (roughly 1 MB of JSON) are written to a
+# gzipped file in the project directory instead of the pendingpush row
+PUSH_FILE_LIST_OFFLOAD_ENTRIES = getattr(settings, 'PUSH_FILE_LIST_OFFLOAD_ENTRIES', 5000)
+
+
+def _json_loads(data):
+    """Parse JSON bytes with orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj, indent=False):
+    """Serialize to UTF-8 JSON bytes with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+
+def _read_manifest(manifest_file):
+    """Read and parse a manifest JSON file"""
+    with open(manifest_file, 'rb') as f:
+        return _json_loads(f.read())
+
+
+@functools.lru_cache(maxsize=MANIFEST_CACHE_SIZE)
+def _read_manifest_cached(manifest_file, mtime_ns, size):
+    """Cached manifest read - callers must treat the result as read-only"""
+    return _read_manifest(manifest_file)
+
+
+def manifest_file_list(manifest):
+    """
+    Project manifest entries down to the fields the file browser shows
+    Sorted by path, so the version diff's merge gets pre-sorted input
+    """
+    return sorted(
+        (
+            {
+                'path': file_entry.get('path'),
+                'size': file_entry.get('size'),
+                'storage': file_entry.get('storage'),
+                'hash': file_entry.get('hash')
+            }
+            for file_entry in manifest.get('files', [])
+        ),
+        key=lambda file_entry: file_entry['path'] or ''
+    )
+
+
 def blob_upload_path(instance, filename):
     """Generate upload path for CAS blobs - organized by hash prefix"""
     hash_prefix = instance.hash[:2]
@@ -128,6 +204,11 @@ def download_zip_path(instance, filename):
     )
 
 
+# ZIPs are built in a scratch directory with this prefix inside the project's
+# downloads directory, so mark_completed links/renames them on one filesystem
+DOWNLOAD_BUILD_DIR_PREFIX = '.building_'
+
+
 class BlobReference(models.Model):
     """
     Track which projects and versions reference each blob
@@ -174,7 +255,9 @@ class FileBlob(models.Model):
     Files >1MB are stored here to enable deduplication
     Automatically cleaned up when all references are removed
     """
-    hash = models.CharField(max_length=64, unique=True, db_index=True)
+    # The unique constraint is the only index on hash - extra b-trees on the
+    # same column just compete for buffer cache on every CAS lookup
+    hash = models.CharField(max_length=64, unique=True)
     file = models.FileField(upload_to=blob_upload_path)
     size = models.BigIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -185,7 +268,6 @@ class FileBlob(models.Model):
         verbose_name_plural = 'File Blobs (CAS)'
         db_table = 'versions_fileblob'
         indexes = [
-            models.Index(fields=['hash']),
             models.Index(fields=['ref_count']),
             models.Index(fields=['created_at']),
         ]
@@ -198,10 +280,9 @@ class FileBlob(models.Model):
         return round(self.size / (1024 * 1024), 2)
     
     def increment_ref(self):
-        """Increment reference count"""
-        self.ref_count = models.F('ref_count') + 1
-        self.save(update_fields=['ref_count'])
-        self.refresh_from_db()
+        """Increment reference count (one UPDATE, no re-read)"""
+        FileBlob.objects.filter(pk=self.pk).update(ref_count=models.F('ref_count') + 1)
+        self.ref_count += 1
     
     def decrement_ref(self):
         """Decrement reference count and cleanup if no references"""
@@ -225,20 +306,10 @@ class FileBlob(models.Model):
 
 @receiver(pre_delete, sender=FileBlob)
 def fileblob_pre_delete(sender, instance, **kwargs):
-    """Delete blob file from storage before model deletion"""
+    """Schedule blob file removal once the deletion commits"""
     if instance.file:
-        try:
-            file_path = instance.file.path
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-                print(f"[BLOB] Deleted blob file: {file_path}")
-                
-                parent_dir = os.path.dirname(file_path)
-                if os.path.exists(parent_dir) and not os.listdir(parent_dir):
-                    os.rmdir(parent_dir)
-                    print(f"[BLOB] Removed empty blob directory: {parent_dir}")
-        except Exception as e:
-            print(f"[BLOB ERROR] Error deleting blob file: {e}")
+        from .cleanup_tasks import schedule_cleanup, cleanup_blob_file
+        schedule_cleanup(cleanup_blob_file, instance.file.name)
 
 
 class Version(models.Model):
@@ -276,6 +347,14 @@ class Version(models.Model):
     
     manifest_file_path = models.CharField(max_length=500, null=True, blank=True)
     
+    # Manifest counters stored at push time so list views never open the
+    # manifest file (NULL on versions created before they existed)
+    manifest_file_count = models.IntegerField(null=True, blank=True)
+    manifest_total_size = models.BigIntegerField(null=True, blank=True)
+    manifest_cas_count = models.IntegerField(null=True, blank=True)
+    manifest_inline_count = models.IntegerField(null=True, blank=True)
+    manifest_cas_threshold_mb = models.FloatField(null=True, blank=True)
+    
     hash = models.CharField(max_length=64, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
@@ -305,9 +384,10 @@ class Version(models.Model):
         indexes = [
             models.Index(fields=['uid']),
             models.Index(fields=['project', '-created_at']),
-            models.Index(fields=['project', 'hash']),
+            models.Index(fields=['project', 'hash', 'status']),
             models.Index(fields=['project', 'is_snapshot']),
-            models.Index(fields=['project', 'status']),
+            models.Index(fields=['project', 'status', '-created_at']),
+            models.Index(fields=['project', 'status', 'version_number']),
             models.Index(fields=['project', 'version_number']),
         ]
 
@@ -331,31 +411,51 @@ class Version(models.Model):
         if self.version_number:
             return self.version_number
         
-        completed_versions = Version.objects.filter(
+        highest = Version.objects.filter(
             project=self.project,
             status='completed'
-        ).exclude(uid=self.uid)
+        ).exclude(uid=self.uid).aggregate(highest=Max('version_number'))['highest']
         
-        self.version_number = completed_versions.count() + 1
+        self.version_number = (highest or 0) + 1
         self.save(update_fields=['version_number'])
         return self.version_number
     
-    def get_file_size_mb(self):
-        """Get file size in megabytes"""
+    @cached_property
+    def file_size_mb(self):
+        """File size in megabytes (memoized for repeated serialization)"""
         if self.file_size:
             return round(self.file_size / (1024 * 1024), 2)
         return 0
     
-    def get_size_change_mb(self):
-        """Get size change in megabytes"""
+    @cached_property
+    def size_change_mb(self):
+        """Size change in megabytes (memoized for repeated serialization)"""
         if self.size_change:
             return round(self.size_change / (1024 * 1024), 2)
         return 0
     
+    def get_file_size_mb(self):
+        """Get file size in megabytes"""
+        return self.file_size_mb
+    
+    def get_size_change_mb(self):
+        """Get size change in megabytes"""
+        return self.size_change_mb
+    
     def get_storage_type(self):
         """Get storage type for display"""
         return 'Full Snapshot' if self.is_snapshot else 'CAS Manifest'
     
+    @property
+    def storage_type_short(self):
+        """Compact storage type label used by version lists"""
+        return 'Snapshot' if self.is_snapshot else 'CAS'
+    
+    @property
+    def has_changes(self):
+        """Whether any file was added, modified or deleted"""
+        return (self.files_added + self.files_modified + self.files_deleted) > 0
+    
     def is_ready(self):
         """Check if version is completed and ready for use"""
         return self.status == 'completed'
@@ -408,20 +508,27 @@ class Version(models.Model):
             f'temp_{self.uid}'
         )
     
-    def save_manifest_to_file(self, manifest_dict):
-        """Save manifest dictionary to file"""
+    def save_manifest_to_file(self, manifest_dict, save=True):
+        """
+        Save manifest dictionary to file
+        With save=False only manifest_file_path is set; the caller saves the row
+        """
         version_dir = self.get_version_directory()
         os.makedirs(version_dir, exist_ok=True)
         
         manifest_file = os.path.join(version_dir, 'manifest.json')
         
         try:
-            with open(manifest_file, 'w', encoding='utf-8') as f:
-                json.dump(manifest_dict, f, indent=2, ensure_ascii=False)
+            with open(manifest_file, 'wb') as f:
+                f.write(_json_dumps(manifest_dict, indent=True))
+            
+            self.write_file_list_sidecar(manifest_dict, version_dir)
             
             relative_path = os.path.relpath(manifest_file, settings.MEDIA_ROOT)
             self.manifest_file_path = relative_path
-            self.save(update_fields=['manifest_file_path'])
+            if save:
+                self.save(update_fields=['manifest_file_path'])
+            self.__dict__.pop('manifest', None)
             
             print(f"[MANIFEST] Saved to {manifest_file}")
             return manifest_file
@@ -437,18 +544,145 @@ class Version(models.Model):
         
         manifest_file = os.path.join(settings.MEDIA_ROOT, self.manifest_file_path)
         
-        if not os.path.exists(manifest_file):
+        try:
+            stat = os.stat(manifest_file)
+        except OSError:
             return None
         
         try:
-            with open(manifest_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            if stat.st_size <= MANIFEST_CACHE_MAX_BYTES:
+                return _read_manifest_cached(manifest_file, stat.st_mtime_ns, stat.st_size)
+            return _read_manifest(manifest_file)
         except Exception as e:
             print(f"[ERROR] Manifest load failed: {e}")
             return None
     
-    def get_change_summary(self):
-        """Get detailed change summary"""
+    @cached_property
+    def manifest(self):
+        """Manifest parsed once per instance (shared by serializer fields)"""
+        return self.load_manifest_from_file()
+    
+    def write_file_list_sidecar(self, manifest_dict, version_dir=None):
+        """
+        Write the small (path, size, storage, hash) sidecar next to the
+        manifest; the file browser and the version diff read it instead of
+        the manifest
+        """
+        if version_dir is None:
+            version_dir = os.path.join(settings.MEDIA_ROOT, os.path.dirname(self.manifest_file_path))
+        file_list = manifest_file_list(manifest_dict)
+        with open(os.path.join(version_dir, 'file_list.json'), 'wb') as f:
+            f.write(_json_dumps(file_list))
+        return file_list
+    
+    def load_file_list_from_file(self):
+        """
+        Load the file list sidecar written next to the manifest
+        Returns None if it is missing (versions saved before it existed)
+        """
+        if not self.manifest_file_path:
+            return None
+        
+        file_list_file = os.path.join(
+            settings.MEDIA_ROOT, os.path.dirname(self.manifest_file_path), 'file_list.json'
+        )
+        
+        try:
+            with open(file_list_file, 'rb') as f:
+                return _json_loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("File list load failed for %s: %s", self.uid, e)
+            return None
+    
+    @property
+    def file_list_cache_key(self):
+        """Django cache key of this version's file browser listing"""
+        return f'version_file_list:{self.uid}'
+    
+    @property
+    def file_list_body_cache_key(self):
+        """Django cache key of the rendered JSON body of VersionFileListView"""
+        return f'version_file_list_body:{self.uid}'
+    
+    def get_inline_pack_path(self, manifest):
+        """
+        Absolute path of the pack holding the manifest's inline files
+        None for manifests that embed inline files as base64 'content'
+        """
+        if not self.manifest_file_path or not manifest.get('inline_pack'):
+            return None
+        return os.path.join(
+            settings.MEDIA_ROOT, os.path.dirname(self.manifest_file_path), manifest['inline_pack']
+        )
+    
+    def get_manifest_summary(self):
+        """
+        Summarize the manifest's storage breakdown
+        Built from the stored counters; only legacy rows read the file
+        """
+        if self.is_snapshot:
+            return {
+                'type': 'snapshot',
+                'message': 'Full ZIP snapshot'
+            }
+        
+        if self.manifest_file_count is not None:
+            return {
+                'type': 'cas',
+                'total_files': self.manifest_file_count,
+                'cas_files': self.manifest_cas_count,
+                'inline_files': self.manifest_inline_count,
+                'cas_threshold_mb': self.manifest_cas_threshold_mb
+            }
+        
+        # Legacy rows: a completed manifest never changes, so its summary is
+        # cached across requests
+        if self.status == 'completed':
+            cache_key = f'manifest_summary:{self.uid}'
+            summary = cache.get(cache_key)
+            if summary is None:
+                summary = self._summarize_manifest()
+                if 'total_files' in summary:
+                    cache.set(cache_key, summary, MANIFEST_SUMMARY_CACHE_SECONDS)
+            return summary
+        
+        return self._summarize_manifest()
+    
+    def _summarize_manifest(self):
+        """Count manifest entries by storage type in a single pass"""
+        manifest = self.manifest
+        if not manifest:
+            return {
+                'type': 'cas',
+                'message': 'Manifest not available'
+            }
+        
+        files = manifest.get('files', [])
+        cas_count = 0
+        inline_count = 0
+        for file_entry in files:
+            storage = file_entry.get('storage')
+            if storage == 'cas':
+                cas_count += 1
+            elif storage == 'inline':
+                inline_count += 1
+        
+        return {
+            'type': 'cas',
+            'total_files': len(files),
+            'cas_files': cas_count,
+            'inline_files': inline_count,
+            'cas_threshold_mb': manifest.get('cas_threshold_mb')
+        }
+    
+    def get_change_summary(self, max_files=None):
+        """
+        Get detailed change summary
+        With max_files, each file list is cut to that length and flagged
+        with <kind>_truncated when more files changed
+        """
         if not self.previous_version:
             return {
                 'is_initial': True,
@@ -461,78 +695,98 @@ class Version(models.Model):
                 'deleted_files': []
             }
         
-        return {
+        summary = {
             'is_initial': False,
             'files_added': self.files_added,
             'files_modified': self.files_modified,
             'files_deleted': self.files_deleted,
             'size_change_mb': self.get_size_change_mb(),
             'previous_version_number': self.previous_version.version_number,
-            'added_files': self.change_details.get('added_files', []),
-            'modified_files': self.change_details.get('modified_files', []),
-            'deleted_files': self.change_details.get('deleted_files', [])
         }
+        
+        for key in ('added_files', 'modified_files', 'deleted_files'):
+            files = self.change_details.get(key) or []
+            if max_files is not None and len(files) > max_files:
+                files = files[:max_files]
+                summary[f'{key}_truncated'] = True
+            summary[key] = files
+        
+        return summary
+
+
+def touch_project_versions(project_id, recount=False):
+    """
+    Stamp a project's versions_changed_at and, when a version status may have
+    changed, recount its completed versions - one UPDATE, no read
+    """
+    from django.utils import timezone
+    changes = {'versions_changed_at': timezone.now()}
+    if recount:
+        completed = Version.objects.filter(
+            project=OuterRef('pk'), status='completed'
+        ).order_by().values('project').annotate(n=Count('id')).values('n')
+        changes['completed_version_count'] = Coalesce(Subquery(completed), Value(0))
+    Project.objects.filter(pk=project_id).update(**changes)
+
+
+@receiver(post_save, sender=Version)
+def version_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the project's version counter and change stamp in step"""
+    if created:
+        recount = instance.status == 'completed'
+    else:
+        recount = update_fields is None or 'status' in update_fields
+    touch_project_versions(instance.project_id, recount)
+
+
+@receiver(post_delete, sender=Version)
+def version_post_delete(sender, instance, **kwargs):
+    """Deleting a version restamps its project (and lowers the counter); its cached listing and body are dropped"""
+    touch_project_versions(instance.project_id, instance.status == 'completed')
+    if instance.status == 'completed':
+        cache.delete_many([instance.file_list_cache_key, instance.file_list_body_cache_key])
 
 
 @receiver(pre_delete, sender=Version)
 def version_pre_delete(sender, instance, **kwargs):
-    """Clean up version files and decrement blob references"""
-    print(f"\n[VERSION CLEANUP] Starting cleanup for version {instance.uid}")
-    
+    """
+    Collect version files and blob IDs for cleanup
+    The manifest lives inside the version directory, so it has to be read
+    here - everything else is handed to a Celery task after commit
+    """
+    snapshot_path = None
     if instance.file and instance.is_snapshot:
         try:
-            file_path = instance.file.path
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-                print(f"[VERSION] Deleted snapshot: {file_path}")
+            snapshot_path = instance.file.path
         except Exception as e:
-            print(f"[VERSION ERROR] Snapshot deletion failed: {e}")
+            logger.warning("Could not resolve snapshot path of version %s: %s", instance.uid, e)
     
+    blob_ids = []
     manifest = instance.load_manifest_from_file()
     if manifest and isinstance(manifest, dict):
-        files = manifest.get('files', [])
-        
-        for file_info in files:
-            if file_info.get('storage') == 'cas':
-                blob_id = file_info.get('blob_id')
-                if blob_id:
-                    try:
-                        blob = FileBlob.objects.get(id=blob_id)
-                        
-                        BlobReference.objects.filter(
-                            blob=blob,
-                            version=instance
-                        ).delete()
-                        
-                        print(f"[BLOB] Removed reference for blob {blob.hash[:16]}...")
-                        
-                        if not blob.is_referenced_by_other_projects():
-                            blob.decrement_ref()
-                            print(f"[BLOB] Decremented ref for blob {blob.hash[:16]}... (refs: {blob.ref_count})")
-                        else:
-                            print(f"[BLOB] Blob {blob.hash[:16]}... still referenced by other projects, keeping it")
-                    
-                    except FileBlob.DoesNotExist:
-                        print(f"[BLOB WARNING] Blob {blob_id} not found")
-                    except Exception as e:
-                        print(f"[BLOB ERROR] Error handling blob reference: {e}")
-
-
-@receiver(post_delete, sender=Version)
-def version_post_delete(sender, instance, **kwargs):
-    """Clean up version directory after deletion"""
+        blob_ids = [
+            file_info['blob_id']
+            for file_info in manifest.get('files', [])
+            if file_info.get('storage') == 'cas' and file_info.get('blob_id')
+        ]
+    
     try:
         version_dir = instance.get_version_directory()
-        if os.path.exists(version_dir):
-            shutil.rmtree(version_dir, ignore_errors=True)
-            print(f"[VERSION] Deleted directory: {version_dir}")
-            
-            versions_dir = os.path.dirname(version_dir)
-            if os.path.exists(versions_dir) and not os.listdir(versions_dir):
-                os.rmdir(versions_dir)
-                print(f"[VERSION] Removed empty versions directory")
     except Exception as e:
-        print(f"[VERSION ERROR] Directory cleanup failed: {e}")
+        logger.warning("Could not resolve directory of version %s: %s", instance.uid, e)
+        version_dir = None
+    
+    from .cleanup_tasks import schedule_cleanup, cleanup_version_artifacts
+    schedule_cleanup(cleanup_version_artifacts, version_dir, snapshot_path, blob_ids)
+
+# Download statuses a new request for the same version can reuse
+ACTIVE_DOWNLOAD_STATUSES = ('pending', 'processing', 'completed')
+
+
+def recent_download_cache_key(version_id, user_id):
+    """Django cache key holding the id of a user's latest download request for a version"""
+    return f'recent_download:{version_id}:{user_id}'
+
 
 class DownloadRequest(models.Model):
     """Download request with UUID and expiration"""
@@ -544,6 +798,7 @@ class DownloadRequest(models.Model):
         ('expired', 'Expired'),
     ]
     
+    ACTIVE_STATUSES = ACTIVE_DOWNLOAD_STATUSES
     EXPIRATION_HOURS = 1
     
     uid = models.CharField(max_length=16, unique=True, db_index=True, editable=False)
@@ -577,6 +832,14 @@ class DownloadRequest(models.Model):
         indexes = [
             models.Index(fields=['uid']),
             models.Index(fields=['version', '-created_at']),
+            # Per-user "recent download" lookup; partial on the reusable
+            # statuses, so failed/expired rows never take up index pages and
+            # the index still supplies the order
+            models.Index(
+                fields=['version', 'requested_by', '-created_at'],
+                condition=Q(status__in=ACTIVE_DOWNLOAD_STATUSES),
+                name='versions_do_recent_active_idx'
+            ),
             models.Index(fields=['status']),
             models.Index(fields=['expires_at']),
         ]
@@ -589,22 +852,36 @@ class DownloadRequest(models.Model):
     def __str__(self):
         return f"Download {self.uid} - v{self.version.version_number} by {self.requested_by.username} [{self.status}]"
     
-    def mark_completed(self, zip_path, file_size):
-        """Mark download as completed"""
+    def mark_completed(self, zip_path, file_size=None):
+        """
+        Mark download as completed
+        Hardlinks (or moves) the finished ZIP into MEDIA_ROOT instead of
+        copying it through the storage backend
+        """
         from django.utils import timezone
         from datetime import timedelta
-        from django.core.files import File
-        
+
+        relative_path = download_zip_path(self, os.path.basename(zip_path))
+        target_path = self.zip_file.storage.path(relative_path)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+        try:
+            os.link(zip_path, target_path)
+        except OSError:
+            # Different filesystem (or target already exists) - fall back to move
+            shutil.move(zip_path, target_path)
+
         self.status = 'completed'
         self.progress = 100
         self.completed_at = timezone.now()
-        self.expires_at = timezone.now() + timedelta(hours=self.EXPIRATION_HOURS)
-        self.file_size = file_size
-        
-        with open(zip_path, 'rb') as f:
-            self.zip_file.save(os.path.basename(zip_path), File(f), save=False)
-        
-        self.save()
+        self.expires_at = self.completed_at + timedelta(hours=self.EXPIRATION_HOURS)
+        self.zip_file.name = relative_path
+        self.file_size = os.path.getsize(target_path)
+        self.__dict__.pop('file_size_mb', None)
+
+        self.save(update_fields=[
+            'status', 'progress', 'completed_at', 'expires_at', 'zip_file', 'file_size'
+        ])
     
     def mark_failed(self, error_message):
         """Mark download as failed"""
@@ -615,25 +892,53 @@ class DownloadRequest(models.Model):
         self.error_details = sanitize_text(error_message)
         self.save()
     
-    def is_expired(self):
-        """Check if download has expired"""
+    def mark_expired(self, message):
+        """
+        Flag a completed download as expired
+        A single conditional UPDATE (DownloadRequest has no save signals), so
+        concurrent status checks do not overwrite each other; the instance is
+        updated in memory for the response
+        """
+        DownloadRequest.objects.filter(pk=self.pk, status='completed').update(
+            status='expired', message=message
+        )
+        self.status = 'expired'
+        self.message = message
+    
+    @cached_property
+    def file_size_mb(self):
+        """ZIP size in megabytes, None until the ZIP exists"""
+        if self.file_size:
+            return round(self.file_size / (1024 * 1024), 2)
+        return None
+    
+    @property
+    def download_filename(self):
+        """Attachment filename of the ZIP (<project>_v<number>.zip)"""
+        return f"{self.version.project.name}_v{self.version.version_number or 'unknown'}.zip"
+    
+    def is_expired(self, now=None):
+        """Check if download has expired (now may be passed in to share one clock read)"""
         from django.utils import timezone
-        if self.expires_at and self.expires_at < timezone.now():
+        if self.expires_at and self.expires_at < (now or timezone.now()):
             return True
         return False
     
-    def get_time_remaining_seconds(self):
+    def get_time_remaining_seconds(self, now=None):
         """Get time remaining in seconds"""
         from django.utils import timezone
         if self.expires_at and self.status == 'completed':
-            remaining = (self.expires_at - timezone.now()).total_seconds()
+            remaining = (self.expires_at - (now or timezone.now())).total_seconds()
             return max(0, int(remaining))
         return 0
     
-    def get_time_remaining_formatted(self):
+    def get_time_remaining_formatted(self, now=None):
         """Get formatted time remaining"""
-        seconds = self.get_time_remaining_seconds()
-        
+        return self.format_time_remaining(self.get_time_remaining_seconds(now))
+    
+    @staticmethod
+    def format_time_remaining(seconds):
+        """Format a get_time_remaining_seconds() value"""
         if seconds <= 0:
             return "Expired"
         
@@ -647,6 +952,14 @@ class DownloadRequest(models.Model):
         else:
             return f"{int(seconds)}s"
     
+    def get_reuse_message(self, now=None):
+        """Message for handing this request out again instead of a new one, None if it can't be"""
+        if self.status == 'completed' and not self.is_expired(now):
+            return 'Using existing download'
+        if self.status in ('pending', 'processing'):
+            return 'Download already in progress'
+        return None
+    
     def get_download_url(self):
         """Get download URL if available"""
         if self.zip_file and self.status == 'completed' and not self.is_expired():
@@ -656,15 +969,15 @@ class DownloadRequest(models.Model):
 
 @receiver(pre_delete, sender=DownloadRequest)
 def download_request_pre_delete(sender, instance, **kwargs):
-    """Delete ZIP file before model deletion"""
+    """Schedule ZIP removal once the deletion commits"""
     if instance.zip_file:
         try:
             file_path = instance.zip_file.path
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-                print(f"[DOWNLOAD] Deleted ZIP: {file_path}")
         except Exception as e:
-            print(f"[DOWNLOAD ERROR] ZIP deletion failed: {e}")
+            logger.warning("Could not resolve ZIP path of download %s: %s", instance.uid, e)
+            return
+        from .cleanup_tasks import schedule_cleanup, cleanup_download_file
+        schedule_cleanup(cleanup_download_file, file_path)
 
 
 class PendingPush(models.Model):
@@ -680,6 +993,9 @@ class PendingPush(models.Model):
         ('cancelled', 'Cancelled')
     ]
     
+    # Statuses a push can no longer be cancelled from
+    FINAL_STATUSES = ('done', 'failed', 'rejected', 'cancelled')
+    
     uid = models.CharField(max_length=16, unique=True, db_index=True, editable=False)
     
     project = models.ForeignKey(
@@ -693,7 +1009,9 @@ class PendingPush(models.Model):
         related_name='pushes_created_new'
     )
     commit_message = models.TextField()
-    file_list = models.JSONField()
+    # Large lists live in file_list_path instead (see get_file_list)
+    file_list = models.JSONField(null=True, blank=True)
+    file_list_path = models.CharField(max_length=500, null=True, blank=True, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     progress = models.IntegerField(default=0)
     message = models.TextField(null=True, blank=True)
@@ -738,23 +1056,83 @@ class PendingPush(models.Model):
             self.message = sanitize_text(self.message)
         if self.error_details:
             self.error_details = sanitize_text(self.error_details)
+        
+        update_fields = kwargs.get('update_fields')
+        if (
+            isinstance(self.file_list, list)
+            and len(self.file_list) > PUSH_FILE_LIST_OFFLOAD_ENTRIES
+            and (update_fields is None or 'file_list' in update_fields)
+        ):
+            self._offload_file_list()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'file_list_path'}
+        
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"Push {self.uid} by {self.created_by.username} - {self.project} - {self.status}"
     
+    def _offload_file_list(self):
+        """
+        Move a large file list out of the row into
+        users/<user>/projects/<uid>/pushes/<push uid>.json.gz
+        Keeps the pendingpush row small for every later read and update
+        """
+        project = self.project
+        username = project.owner.username if project.owner else 'Unknown'
+        user_id = project.owner.id if project.owner else 0
+        pushes_dir = os.path.join(
+            get_project_storage_path(user_id, username, project.id, project.name, project.uid),
+            'pushes'
+        )
+        os.makedirs(pushes_dir, exist_ok=True)
+        
+        file_path = os.path.join(pushes_dir, f'{self.uid}.json.gz')
+        temp_path = f'{file_path}.part'
+        with open(temp_path, 'wb') as f:
+            f.write(gzip.compress(_json_dumps(self.file_list), compresslevel=1))
+        os.replace(temp_path, file_path)
+        
+        self.__dict__['_loaded_file_list'] = self.file_list
+        self.file_list = None
+        self.file_list_path = os.path.relpath(file_path, settings.MEDIA_ROOT).replace('\\', '/')
+    
+    def get_file_list(self):
+        """
+        The pushed file list, read from its file when it was offloaded
+        Raises FileNotFoundError when that file is gone: an empty list would
+        let the push prune the whole master directory
+        """
+        if not self.file_list_path:
+            return self.file_list
+        if '_loaded_file_list' not in self.__dict__:
+            file_path = os.path.join(settings.MEDIA_ROOT, self.file_list_path)
+            try:
+                with open(file_path, 'rb') as f:
+                    self.__dict__['_loaded_file_list'] = _json_loads(gzip.decompress(f.read()))
+            except FileNotFoundError:
+                logger.error("File list of push %s missing: %s", self.uid, file_path)
+                raise
+        return self.__dict__['_loaded_file_list']
+    
     def is_active(self):
         """Check if push is currently active"""
         return self.status in [
             'pending', 'awaiting_approval', 'approved', 'processing'
         ]
     
-    def mark_completed(self):
-        """Mark push as completed"""
+    def mark_completed(self, message=None):
+        """
+        Mark push as completed (progress 100, optional final message)
+        Only the terminal columns and the version link are written, not the file list
+        """
         from django.utils import timezone
         self.status = 'done'
+        self.progress = 100
         self.completed_at = timezone.now()
-        self.save()
+        if message is not None:
+            self.message = message
+        self.save(update_fields=['status', 'progress', 'message', 'completed_at', 'version'])
     
     def mark_failed(self, error_message=None):
         """Mark push as failed"""
@@ -764,7 +1142,7 @@ class PendingPush(models.Model):
         self.completed_at = timezone.now()
         if error_message:
             self.error_details = sanitize_text(error_message)
-        self.save()
+        self.save(update_fields=['status', 'progress', 'completed_at', 'error_details'])
         
         if self.version:
             try:
@@ -772,41 +1150,74 @@ class PendingPush(models.Model):
             except Exception as e:
                 print(f"[ERROR] Version mark failed: {e}")
     
+    def _claim_transition(self, queryset, **fields):
+        """
+        Apply a status transition with one conditional UPDATE
+        Concurrent approve/reject/cancel clicks race on the row itself: only
+        the request whose UPDATE matches gets True (and the instance updated
+        in memory); the others get False and refresh_from_db() the winner's
+        status
+        """
+        if not queryset.filter(pk=self.pk).update(**fields):
+            self.refresh_from_db(fields=['status'])
+            return False
+        for field, value in fields.items():
+            setattr(self, field, value)
+        return True
+    
+    def _schedule_version_deletion(self):
+        """Hand the version of a rejected/cancelled push to a Celery task (after commit)"""
+        if self.version_id:
+            from .cleanup_tasks import schedule_cleanup, delete_push_version
+            schedule_cleanup(delete_push_version, self.version_id)
+    
     def cancel(self):
-        """Cancel push"""
+        """Cancel push (False if it already finished)"""
         from django.utils import timezone
-        self.status = 'cancelled'
-        self.message = 'Cancelled by user'
-        self.progress = 100
-        self.completed_at = timezone.now()
-        self.save()
+        if not self._claim_transition(
+            PendingPush.objects.exclude(status__in=self.FINAL_STATUSES),
+            status='cancelled',
+            message='Cancelled by user',
+            progress=100,
+            completed_at=timezone.now()
+        ):
+            return False
         
-        if self.version:
-            try:
-                self.version.delete()
-            except Exception as e:
-                print(f"[ERROR] Version deletion on cancel failed: {e}")
+        self._schedule_version_deletion()
+        return True
     
     def approve(self, approver):
-        """Approve push"""
+        """Approve push (False if it is no longer awaiting approval)"""
         from django.utils import timezone
-        self.status = 'approved'
-        self.approved_by = approver
-        self.approved_at = timezone.now()
-        self.save()
+        return self._claim_transition(
+            PendingPush.objects.filter(status='awaiting_approval'),
+            status='approved',
+            approved_by=approver,
+            approved_at=timezone.now()
+        )
     
     def reject(self, rejector, reason=None):
-        """Reject push"""
+        """Reject push (False if it is no longer awaiting approval)"""
         from django.utils import timezone
-        self.status = 'rejected'
-        self.approved_by = rejector
-        self.approved_at = timezone.now()
-        self.rejection_reason = sanitize_text(reason) if reason else None
-        self.completed_at = timezone.now()
-        self.save()
+        now = timezone.now()
+        if not self._claim_transition(
+            PendingPush.objects.filter(status='awaiting_approval'),
+            status='rejected',
+            approved_by=rejector,
+            approved_at=now,
+            rejection_reason=sanitize_text(reason) if reason else None,
+            completed_at=now
+        ):
+            return False
         
-        if self.version:
-            try:
-                self.version.delete()
-            except Exception as e:
-                print(f"[ERROR] Version deletion on reject failed: {e}")
\ No newline at end of file
+        self._schedule_version_deletion()
+        return True
+
+@receiver(post_delete, sender=PendingPush)
+def pending_push_post_delete(sender, instance, **kwargs):
+    """Schedule removal of an offloaded file list once the deletion commits"""
+    if instance.file_list_path:
+        from .cleanup_tasks import schedule_cleanup, cleanup_push_file_list
+        schedule_cleanup(
+            cleanup_push_file_list, os.path.join(settings.MEDIA_ROOT, instance.file_list_path)
+        )
@@ -4,12 +4,95 @@ Utilities for restoring versions from CAS or snapshots
 Works with file-based manifest storage and project ID paths
 """
 
+import io
 import os
-import base64
+import sys
+import stat
+import time
+import queue
+import zlib
+import logging
+import mmap
+import shutil
 import zipfile
 import tempfile
+import contextlib
+from binascii import a2b_base64 as _b64decode
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.conf import settings
-from .models import Version, FileBlob
+from django.core.cache import cache
+from .models import Version, FileBlob, manifest_file_list, FILE_LIST_CACHE_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Archives with more members than this are extracted in parallel
+PARALLEL_EXTRACT_MIN_FILES = 16
+EXTRACT_MAX_WORKERS = os.cpu_count() or 1
+EXTRACT_READ_BUFSIZE = 1024 * 1024
+# Blob copies are I/O-bound, so oversubscribe the cores
+COPY_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Each pool task copies a batch of up to 64 blobs; tiny restores skip the pool
+COPY_BATCH_SIZE = 64
+COPY_INLINE_MAX_JOBS = 4
+ZIP_COMPRESSLEVEL = getattr(settings, 'VERSION_ZIP_COMPRESSLEVEL', 1)
+# ZIP members are deflated on a pool (zlib releases the GIL); compressed
+# output stays in memory up to 8 MiB per member, then spills to disk
+ZIP_COMPRESS_MAX_WORKERS = os.cpu_count() or 1
+ZIP_COMPRESS_CHUNK = 1024 * 1024
+ZIP_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# Appending pre-deflated members updates ZipFile's private bookkeeping
+# (_writecheck, _didModify, start_dir, NameToInfo), checked against CPython
+# 3.8-3.13; any other interpreter writes sequentially via ZipFile.write()
+ZIP_PARALLEL_APPEND_SUPPORTED = (
+    sys.implementation.name == 'cpython'
+    and (3, 8) <= sys.version_info[:2] <= (3, 13)
+    and hasattr(zipfile.ZipFile, '_writecheck')
+)
+# Already-compressed formats are stored as-is: deflating them burns CPU
+# for almost no size reduction
+ZIP_STORED_EXTENSIONS = frozenset(getattr(settings, 'VERSION_ZIP_STORED_EXTENSIONS', (
+    '.mp3', '.ogg', '.oga', '.opus', '.flac', '.m4a', '.aac', '.wma',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.mp4', '.mov', '.mkv', '.webm', '.avi',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst',
+)))
+# Copy fallback and ZIP compression read through pooled 1 MiB buffers
+IO_BUFFER_SIZE = 1024 * 1024
+# Linux FICLONE ioctl (_IOW(0x94, 9, int)): share extents on btrfs/XFS
+FICLONE = 0x40049409
+
+
+class BufferPool:
+    """
+    Reusable fixed-size bytearrays for the copy and compress workers
+    Buffers are allocated on first use; up to max_buffers are kept for reuse
+    """
+    
+    def __init__(self, buffer_size: int, max_buffers: int):
+        self.buffer_size = buffer_size
+        self.max_buffers = max_buffers
+        self._free = queue.SimpleQueue()
+    
+    @contextlib.contextmanager
+    def buffer(self):
+        try:
+            buf = self._free.get_nowait()
+        except queue.Empty:
+            buf = bytearray(self.buffer_size)
+        try:
+            yield buf
+        finally:
+            if self._free.qsize() < self.max_buffers:
+                self._free.put(buf)
+
+
+io_buffers = BufferPool(IO_BUFFER_SIZE, max(COPY_MAX_WORKERS, ZIP_COMPRESS_MAX_WORKERS))
 
 
 def restore_version_to_directory(version: Version, target_dir: str) -> dict:
@@ -50,12 +133,101 @@ def restore_version_to_directory(version: Version, target_dir: str) -> dict:
     except Exception as e:
         stats['errors'].append(f"Fatal error: {str(e)}")
         stats['success'] = False
-        import traceback
-        traceback.print_exc()
+        logger.exception("Restore of version %s failed", version.id)
     
     return stats
 
 
+def _extract_members(zip_path: str, infos: list, target_dir: str, start: int, end: int):
+    """
+    Extract a contiguous run of members using a private ZipFile handle
+    The byte range is hinted to the kernel up front and read through a
+    large buffer, so slow or network storage streams ahead of inflate
+    """
+    with open(zip_path, 'rb', buffering=EXTRACT_READ_BUFSIZE) as fh:
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                os.posix_fadvise(fh.fileno(), start, end - start, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+        with zipfile.ZipFile(fh, 'r') as zipf:
+            for info in infos:
+                zipf.extract(info, target_dir)
+
+
+def _member_parent_dir(target_dir: str, info: zipfile.ZipInfo) -> str:
+    """
+    Directory ZipFile.extract() will write a member into
+    Same sanitizing as ZipFile._extract_member: drive letters and '', '.',
+    '..' path components are dropped
+    """
+    arcname = info.filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid_parts = ('', os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(part for part in arcname.split(os.path.sep) if part not in invalid_parts)
+    return os.path.dirname(os.path.normpath(os.path.join(target_dir, arcname)))
+
+
+def _fast_extractall(zip_path: str, target_dir: str) -> tuple:
+    """
+    Extract a ZIP archive across several threads
+    zlib releases the GIL while inflating, so members spread over threads
+    decompress in parallel. Each thread gets a contiguous, byte-balanced
+    slice of the archive in on-disk order. Small archives go straight
+    through extractall.
+    
+    Returns:
+        (files extracted, total uncompressed size) from the central directory
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zipf:
+        infos = zipf.infolist()
+        file_infos = [info for info in infos if not info.is_dir()]
+        totals = (len(file_infos), sum(info.file_size for info in file_infos))
+        
+        if len(infos) <= PARALLEL_EXTRACT_MIN_FILES or EXTRACT_MAX_WORKERS < 2:
+            zipf.extractall(target_dir)
+            return totals
+        
+        # Directory entries first so workers never race on mkdir
+        for info in infos:
+            if info.is_dir():
+                zipf.extract(info, target_dir)
+    
+    # Snapshots only hold file entries, so every parent directory is created
+    # here too - extract() only calls makedirs for directories that do not
+    # exist yet, and two workers doing that at once fail with FileExistsError
+    for parent_dir in {_member_parent_dir(target_dir, info) for info in file_infos}:
+        os.makedirs(parent_dir, exist_ok=True)
+    
+    file_infos.sort(key=lambda info: info.header_offset)
+    workers = min(EXTRACT_MAX_WORKERS, len(file_infos))
+    target_bytes = sum(info.compress_size for info in file_infos) / workers
+    
+    slices = [[]]
+    slice_bytes = 0
+    for info in file_infos:
+        if slice_bytes >= target_bytes and len(slices) < workers:
+            slices.append([])
+            slice_bytes = 0
+        slices[-1].append(info)
+        slice_bytes += info.compress_size
+    
+    with ThreadPoolExecutor(max_workers=len(slices)) as executor:
+        futures = []
+        for members in slices:
+            last = members[-1]
+            # Local header is 30 bytes + name + extra; pad for the extra field
+            start = members[0].header_offset
+            end = last.header_offset + 30 + len(last.filename.encode()) + last.compress_size + 1024
+            futures.append(executor.submit(_extract_members, zip_path, members, target_dir, start, end))
+        for future in futures:
+            future.result()
+    
+    return totals
+
+
 def _restore_from_snapshot(version: Version, target_dir: str) -> dict:
     """Restore files from ZIP snapshot"""
     stats = {'files_restored': 0, 'total_size': 0, 'errors': []}
@@ -68,16 +240,10 @@ def _restore_from_snapshot(version: Version, target_dir: str) -> dict:
     if not os.path.exists(zip_path):
         raise FileNotFoundError(f"Snapshot file not found: {zip_path}")
     
-    print(f"Extracting snapshot from: {zip_path}")
+    logger.debug("Extracting snapshot from: %s", zip_path)
     
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zipf:
-            zipf.extractall(target_dir)
-            
-            for info in zipf.filelist:
-                if not info.is_dir():
-                    stats['files_restored'] += 1
-                    stats['total_size'] += info.file_size
+        stats['files_restored'], stats['total_size'] = _fast_extractall(zip_path, target_dir)
     
     except Exception as e:
         stats['errors'].append(f"Error extracting snapshot: {str(e)}")
@@ -85,9 +251,187 @@ def _restore_from_snapshot(version: Version, target_dir: str) -> dict:
     return stats
 
 
+def _kernel_copy(src_fd: int, dst_fd: int, size: int) -> bool:
+    """
+    Copy size bytes between fds inside the kernel
+    Tries a reflink clone, then copy_file_range, then sendfile
+    Returns False if none of them is usable here (including a first call
+    that copies nothing, as copy_file_range does on some filesystems -
+    shutil falls back in that case too); raises OSError on a short copy
+    """
+    if fcntl is not None and sys.platform.startswith('linux'):
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+            return True
+        except OSError:
+            # EOPNOTSUPP / EXDEV / EINVAL - not a reflink-capable pair
+            pass
+    
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                sent = os.copy_file_range(src_fd, dst_fd, size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            # EXDEV / ENOSYS / EINVAL on older kernels - retry only if nothing was written
+            if copied:
+                raise
+    
+    if copied == 0 and hasattr(os, 'sendfile'):
+        try:
+            while copied < size:
+                sent = os.sendfile(dst_fd, src_fd, copied, size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            if copied:
+                raise
+    
+    if copied == 0:
+        return False
+    if copied != size:
+        raise OSError(f"Short copy: {copied} of {size} bytes written")
+    return True
+
+
+def fast_copy_file(src_path: str, dest_path: str, preserve_stat: bool = False):
+    """
+    Copy file contents without bouncing them through userspace buffers
+    Tries a FICLONE reflink, copy_file_range, then sendfile, then a
+    read/write loop through a pooled buffer. With preserve_stat the source
+    mode and atime/mtime are applied afterwards (what shutil.copy2 keeps,
+    minus xattrs); otherwise metadata is not copied.
+    """
+    binary = getattr(os, 'O_BINARY', 0)
+    src_fd = os.open(src_path, os.O_RDONLY | binary)
+    try:
+        dst_fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | binary, 0o644)
+        try:
+            src_stat = os.fstat(src_fd)
+            size = src_stat.st_size
+            if size and not _kernel_copy(src_fd, dst_fd, size):
+                reader = io.FileIO(src_fd, 'rb', closefd=False)
+                with io_buffers.buffer() as buf:
+                    buf_view = memoryview(buf)
+                    while True:
+                        read = reader.readinto(buf)
+                        if not read:
+                            break
+                        view = buf_view[:read]
+                        while view:
+                            view = view[os.write(dst_fd, view):]
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    
+    if preserve_stat:
+        os.chmod(dest_path, stat.S_IMODE(src_stat.st_mode))
+        os.utime(dest_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+
+def iter_tree_files(root: str):
+    """
+    Yield (relative_path, absolute_path) for every regular file under root
+    Walks with os.scandir directly; DirEntry type checks come from readdir,
+    so no entry is stat'ed. Relative paths use '/' separators.
+    """
+    stack = [(root, '')]
+    while stack:
+        dir_path, rel_prefix = stack.pop()
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, rel_prefix + entry.name + '/'))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield rel_prefix + entry.name, entry.path
+        except OSError as e:
+            logger.error("Error scanning %s: %s", dir_path, e)
+
+
+def write_file_bytes(dest_path: str, data: bytes):
+    """
+    Write a bytes buffer to dest_path with raw fd syscalls
+    Skips the buffered file object; a single write usually covers it
+    """
+    fd = os.open(dest_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def open_inline_pack(version: Version, manifest: dict):
+    """
+    Map a version's inline pack read-only
+    Returns None if the manifest has no pack (base64 'content' entries) or
+    the pack cannot be opened; callers close a returned mmap
+    """
+    pack_path = version.get_inline_pack_path(manifest)
+    if pack_path is None:
+        return None
+    try:
+        with open(pack_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap rejects empty files; a pack of empty files is just b''
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError as e:
+        logger.error("Inline pack unavailable (%s): %s", pack_path, e)
+        return None
+
+
+def read_inline_content(file_entry: dict, pack) -> bytes:
+    """
+    Bytes of an inline manifest entry, sliced from the version's pack or
+    decoded from the base64 'content' older manifests embed
+    """
+    if 'offset' in file_entry:
+        if pack is None:
+            raise ValueError("inline pack not found")
+        offset = file_entry['offset']
+        size = file_entry.get('size', 0)
+        data = bytes(pack[offset:offset + size])
+        if len(data) != size:
+            raise ValueError("inline pack is truncated")
+        return data
+    
+    content_b64 = file_entry.get('content')
+    if content_b64 is None:
+        raise ValueError("no content")
+    return _b64decode(content_b64)
+
+
+def _copy_batch(jobs: list) -> tuple:
+    """
+    Copy a batch of (blob_path, dest_path, size, rel_path) jobs
+    Returns (files_restored, total_size, errors)
+    """
+    restored = 0
+    total_size = 0
+    errors = []
+    for blob_path, dest_path, size, rel_path in jobs:
+        try:
+            fast_copy_file(blob_path, dest_path)
+            restored += 1
+            total_size += size
+        except Exception as e:
+            errors.append(f"Error restoring CAS file {rel_path}: {str(e)}")
+    return restored, total_size, errors
+
+
 def _restore_from_manifest(version: Version, target_dir: str) -> dict:
     """
     Restore files from CAS manifest stored in file
+    Blob lookups and inline writes happen on the calling thread; blob
+    copies are fanned out to a thread pool so disk waits overlap
     
     Args:
         version: Version instance
@@ -106,7 +450,28 @@ def _restore_from_manifest(version: Version, target_dir: str) -> dict:
     
     files = manifest.get('files', [])
     
-    print(f"Restoring {len(files)} files from CAS manifest")
+    logger.debug("Restoring %d files from CAS manifest", len(files))
+    
+    # Create every parent directory once up front (parents first)
+    parent_dirs = {
+        os.path.dirname(os.path.join(target_dir, file_entry['path']))
+        for file_entry in files
+        if file_entry.get('path')
+    }
+    for parent_dir in sorted(parent_dirs, key=len):
+        os.makedirs(parent_dir, exist_ok=True)
+    
+    # One query for every blob the manifest references
+    blob_ids = [
+        file_entry['blob_id']
+        for file_entry in files
+        if file_entry.get('storage') == 'cas' and file_entry.get('blob_id')
+    ]
+    blobs = FileBlob.objects.only('id', 'file', 'size').in_bulk(blob_ids) if blob_ids else {}
+    
+    copy_jobs = []  # (blob_path, dest_path, size, rel_path)
+    path_join = os.path.join
+    pack = open_inline_pack(version, manifest)
     
     for file_entry in files:
         try:
@@ -117,8 +482,7 @@ def _restore_from_manifest(version: Version, target_dir: str) -> dict:
                 stats['errors'].append("File entry missing path")
                 continue
             
-            dest_path = os.path.join(target_dir, rel_path)
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            dest_path = path_join(target_dir, rel_path)
             
             if storage_type == 'cas':
                 # Restore from CAS blob
@@ -128,45 +492,31 @@ def _restore_from_manifest(version: Version, target_dir: str) -> dict:
                     stats['errors'].append(f"No blob_id for {rel_path}")
                     continue
                 
+                blob = blobs.get(blob_id)
+                if blob is None:
+                    stats['errors'].append(f"Blob {blob_id} not found for {rel_path}")
+                    continue
+                
                 try:
-                    blob = FileBlob.objects.get(id=blob_id)
                     blob_path = blob.file.path
                     
                     if not os.path.exists(blob_path):
                         stats['errors'].append(f"Blob file not found: {blob_path} for {rel_path}")
                         continue
                     
-                    print(f"Restoring CAS file: {rel_path} from blob {blob_id}")
-                    
-                    # Copy blob file to destination
-                    import shutil
-                    shutil.copy2(blob_path, dest_path)
+                    copy_jobs.append((blob_path, dest_path, blob.size, rel_path))
                     
-                    stats['files_restored'] += 1
-                    stats['total_size'] += blob.size
-                    
-                except FileBlob.DoesNotExist:
-                    stats['errors'].append(f"Blob {blob_id} not found for {rel_path}")
-                    continue
                 except Exception as e:
                     stats['errors'].append(f"Error restoring CAS file {rel_path}: {str(e)}")
                     continue
                 
             elif storage_type == 'inline':
-                # Restore from inline base64 content
-                content_b64 = file_entry.get('content')
-                
-                if not content_b64:
-                    stats['errors'].append(f"No content for inline file {rel_path}")
-                    continue
-                
+                # Restore from the inline pack (or older base64 content)
                 try:
-                    content = base64.b64decode(content_b64)
-                    
-                    with open(dest_path, 'wb') as f:
-                        f.write(content)
+                    content = read_inline_content(file_entry, pack)
+                    write_file_bytes(dest_path, content)
                     
-                    print(f"Restoring inline file: {rel_path}")
+                    logger.debug("Restoring inline file: %s", rel_path)
                     
                     stats['files_restored'] += 1
                     stats['total_size'] += len(content)
@@ -180,14 +530,194 @@ def _restore_from_manifest(version: Version, target_dir: str) -> dict:
         except Exception as e:
             stats['errors'].append(f"Error processing {rel_path}: {str(e)}")
     
-    print(f"Restoration complete: {stats['files_restored']} files restored, {len(stats['errors'])} errors")
+    if isinstance(pack, mmap.mmap):
+        pack.close()
+    
+    if copy_jobs:
+        logger.debug("Copying %d CAS blobs", len(copy_jobs))
+        
+        if len(copy_jobs) <= COPY_INLINE_MAX_JOBS:
+            # Pool startup costs more than it saves for a handful of files
+            results = [_copy_batch(copy_jobs)]
+        else:
+            # Enough batches to keep every worker busy, at most 64 jobs each
+            batch_size = max(1, min(COPY_BATCH_SIZE, -(-len(copy_jobs) // COPY_MAX_WORKERS)))
+            batches = [
+                copy_jobs[i:i + batch_size]
+                for i in range(0, len(copy_jobs), batch_size)
+            ]
+            workers = min(COPY_MAX_WORKERS, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_copy_batch, batch) for batch in batches]
+                results = [future.result() for future in as_completed(futures)]
+        
+        # Results are gathered on this thread, so stats need no lock
+        for restored, total_size, errors in results:
+            stats['files_restored'] += restored
+            stats['total_size'] += total_size
+            stats['errors'].extend(errors)
+    
+    logger.info("Restoration complete: %d files restored, %d errors", stats['files_restored'], len(stats['errors']))
     
     return stats
 
 
+def _deflate_member(arcname: str, source, level: int) -> tuple:
+    """
+    Compress one ZIP member into a raw deflate stream
+    source is either a file path or a bytes buffer
+    Returns (ZipInfo with CRC/sizes filled in, spooled compressed data)
+    """
+    if isinstance(source, (bytes, bytearray)):
+        # Same metadata ZipFile.writestr would use
+        zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+        zinfo.external_attr = 0o600 << 16
+    else:
+        zinfo = zipfile.ZipInfo.from_file(source, arcname)
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    spool = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_SIZE)
+    crc = 0
+    file_size = 0
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            crc = zlib.crc32(source)
+            file_size = len(source)
+            spool.write(compressor.compress(source))
+        else:
+            with open(source, 'rb', buffering=0) as f, io_buffers.buffer() as buf:
+                buf_view = memoryview(buf)
+                while True:
+                    read = f.readinto(buf)
+                    if not read:
+                        break
+                    chunk = buf_view[:read]
+                    crc = zlib.crc32(chunk, crc)
+                    file_size += read
+                    spool.write(compressor.compress(chunk))
+        spool.write(compressor.flush())
+        
+        zinfo.CRC = crc
+        zinfo.file_size = file_size
+        zinfo.compress_size = spool.tell()
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    
+    return zinfo, spool
+
+
+def _append_deflated(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, spool):
+    """
+    Append a pre-compressed member to an open ZipFile
+    Sizes and CRC are known up front, so no data descriptor is needed
+    Only called when ZIP_PARALLEL_APPEND_SUPPORTED
+    """
+    try:
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+        zinfo.header_offset = zipf.fp.tell()
+        zipf.fp.write(zinfo.FileHeader())
+        shutil.copyfileobj(spool, zipf.fp, ZIP_COMPRESS_CHUNK)
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+        zipf.start_dir = zipf.fp.tell()
+    finally:
+        spool.close()
+
+
+def _is_stored_member(arcname: str) -> bool:
+    """Whether a ZIP member is written uncompressed (ZIP_STORED_EXTENSIONS)"""
+    return os.path.splitext(arcname)[1].lower() in ZIP_STORED_EXTENSIONS
+
+
+def write_zip_parallel(zip_path: str, members: list, progress_callback=None) -> list:
+    """
+    Write a deflated ZIP, compressing members on a thread pool
+    Workers read and deflate; this thread appends the finished streams in
+    member order, so the archive layout is deterministic. Members with an
+    already-compressed extension are stored, straight from this thread.
+    
+    Args:
+        zip_path: Destination ZIP path
+        members: list of (arcname, file path or bytes)
+        progress_callback: Optional callable(members_done, members_total)
+    
+    Returns:
+        list of per-member error strings (failed members are left out)
+    """
+    errors = []
+    total = len(members)
+    done = 0
+    workers = max(1, min(ZIP_COMPRESS_MAX_WORKERS, total))
+    # Bound how many compressed members wait for the writer at once
+    window = workers * 2
+    
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL) as zipf:
+        if workers == 1 or not ZIP_PARALLEL_APPEND_SUPPORTED:
+            # Nothing to overlap (or no safe way to append pre-deflated
+            # members) - skip the spooling and write directly
+            for arcname, source in members:
+                compress_type = zipfile.ZIP_STORED if _is_stored_member(arcname) else None
+                try:
+                    if isinstance(source, (bytes, bytearray)):
+                        zipf.writestr(arcname, source, compress_type)
+                    else:
+                        zipf.write(source, arcname, compress_type)
+                except Exception as e:
+                    errors.append(f"Error adding {arcname}: {str(e)}")
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total)
+            return errors
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            
+            def _write_next():
+                arcname, source, future = pending.popleft()
+                try:
+                    if future is None:
+                        if isinstance(source, (bytes, bytearray)):
+                            zipf.writestr(arcname, source, zipfile.ZIP_STORED)
+                        else:
+                            zipf.write(source, arcname, zipfile.ZIP_STORED)
+                    else:
+                        zinfo, spool = future.result()
+                        _append_deflated(zipf, zinfo, spool)
+                except Exception as e:
+                    errors.append(f"Error adding {arcname}: {str(e)}")
+            
+            for arcname, source in members:
+                if _is_stored_member(arcname):
+                    pending.append((arcname, source, None))
+                else:
+                    pending.append((
+                        arcname, source,
+                        executor.submit(_deflate_member, arcname, source, ZIP_COMPRESSLEVEL)
+                    ))
+                while len(pending) >= window:
+                    _write_next()
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, total)
+            
+            while pending:
+                _write_next()
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total)
+    
+    return errors
+
+
 def create_version_zip_on_demand(version: Version) -> str:
     """
     Create a ZIP file from a version on-demand
+    CAS blobs and inline content are written straight into the archive -
+    nothing is restored to a temporary directory first
     
     Args:
         version: Version instance
@@ -202,32 +732,77 @@ def create_version_zip_on_demand(version: Version) -> str:
         # Already a ZIP, return path
         return version.file.path
     
-    # Create temporary directory for restoration
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Restore files
-        stats = restore_version_to_directory(version, temp_dir)
-        
-        if not stats['success'] or stats['files_restored'] == 0:
-            error_msg = '; '.join(stats['errors']) if stats['errors'] else 'Unknown error'
-            raise Exception(f"Failed to restore version: {error_msg}")
+    manifest = version.load_manifest_from_file()
+    if not manifest:
+        raise Exception("Failed to restore version: CAS version has no manifest file or manifest file not found")
+    
+    files = manifest.get('files', [])
+    blob_ids = [
+        file_entry['blob_id']
+        for file_entry in files
+        if file_entry.get('storage') == 'cas' and file_entry.get('blob_id')
+    ]
+    blobs = FileBlob.objects.only('id', 'file', 'size').in_bulk(blob_ids) if blob_ids else {}
+    
+    zip_name = f"{version.project.name}_v{version.version_number}.zip"
+    zip_path = os.path.join(tempfile.gettempdir(), zip_name)
+    
+    errors = []
+    members = []  # (arcname, blob path or inline bytes)
+    pack = open_inline_pack(version, manifest)
+    
+    for file_entry in files:
+        rel_path = file_entry.get('path')
+        storage_type = file_entry.get('storage')
         
-        # Create ZIP
-        zip_name = f"{version.project.name}_v{version.version_number}.zip"
-        zip_path = os.path.join(tempfile.gettempdir(), zip_name)
+        if not rel_path:
+            errors.append("File entry missing path")
+            continue
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    zipf.write(file_path, arcname)
+        try:
+            if storage_type == 'cas':
+                blob = blobs.get(file_entry.get('blob_id'))
+                if blob is None:
+                    errors.append(f"Blob {file_entry.get('blob_id')} not found for {rel_path}")
+                    continue
+                
+                blob_path = blob.file.path
+                if not os.path.exists(blob_path):
+                    errors.append(f"Blob file not found: {blob_path} for {rel_path}")
+                    continue
+                
+                members.append((rel_path, blob_path))
+            
+            elif storage_type == 'inline':
+                members.append((rel_path, read_inline_content(file_entry, pack)))
+            
+            else:
+                errors.append(f"Unknown storage type '{storage_type}' for {rel_path}")
         
-        return zip_path
+        except Exception as e:
+            errors.append(f"Error adding {rel_path}: {str(e)}")
+    
+    if isinstance(pack, mmap.mmap):
+        pack.close()
+    
+    if not errors:
+        errors = write_zip_parallel(zip_path, members)
+    files_written = len(members) - len(errors)
+    
+    if errors or files_written == 0:
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+        error_msg = '; '.join(errors) if errors else 'Unknown error'
+        raise Exception(f"Failed to restore version: {error_msg}")
+    
+    return zip_path
 
 
 def get_version_file_list(version: Version) -> list:
     """
     Get list of files in a version
+    A completed version never changes, so its listing is kept in the Django
+    cache (dropped again when the version is deleted)
     
     Args:
         version: Version instance
@@ -235,6 +810,20 @@ def get_version_file_list(version: Version) -> list:
     Returns:
         list of dicts with file information
     """
+    if version.status != 'completed':
+        return _build_version_file_list(version)
+    
+    files = cache.get(version.file_list_cache_key)
+    if files is None:
+        files = _build_version_file_list(version)
+        # An empty list may just mean the files were unreadable - not cached
+        if files:
+            cache.set(version.file_list_cache_key, files, FILE_LIST_CACHE_SECONDS)
+    return files
+
+
+def _build_version_file_list(version):
+    """Read a version's file list from its snapshot ZIP or manifest sidecar"""
     if version.is_snapshot:
         if not version.file:
             return []
@@ -255,24 +844,19 @@ def get_version_file_list(version: Version) -> list:
                             'compressed_size': info.compress_size
                         })
         except Exception as e:
-            print(f"Error reading snapshot: {e}")
+            logger.error("Error reading snapshot: %s", e)
         
         return files
     
     else:
-        # Load manifest from file
-        manifest = version.load_manifest_from_file()
+        file_list = version.load_file_list_from_file()
+        if file_list is not None:
+            return file_list
+        
+        # Versions saved before the sidecar existed
+        manifest = version.manifest
         
         if not manifest:
             return []
         
-        files = []
-        for file_entry in manifest.get('files', []):
-            files.append({
-                'path': file_entry.get('path'),
-                'size': file_entry.get('size'),
-                'storage': file_entry.get('storage'),
-                'hash': file_entry.get('hash')
-            })
-        
-        return files
\ No newline at end of file
+        return manifest_file_list(manifest)
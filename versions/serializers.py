@@ -3,53 +3,121 @@ versions/serializers.py
 FIXED: UUID support, detailed change tracking, and blob reference info
 """
 
+import functools
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils import timezone
 from .models import Version, PendingPush, FileBlob, DownloadRequest, BlobReference
 
 
+# Choice labels resolved with a dict lookup instead of get_FOO_display()
+VERSION_STATUS_LABELS = dict(Version.STATUS_CHOICES)
+DOWNLOAD_STATUS_LABELS = dict(DownloadRequest.STATUS_CHOICES)
+
+
+def build_absolute_url(serializer, url):
+    """
+    Make a storage URL absolute for the current request
+    The scheme/host prefix is computed once and kept in the context
+    """
+    request = serializer.context.get('request')
+    if not request:
+        return url
+    if not url.startswith('/'):
+        # Already absolute (e.g. remote storage)
+        return request.build_absolute_uri(url)
+    host = serializer.context.get('_host')
+    if host is None:
+        host = serializer.context['_host'] = request.build_absolute_uri('/').rstrip('/')
+    return host + url
+
+
+def get_serializer_now(serializer):
+    """
+    One timezone.now() per serialization, stored in the context
+    List serializers share their context, so every row sees the same clock
+    """
+    now = serializer.context.get('now')
+    if now is None:
+        now = serializer.context['now'] = timezone.now()
+    return now
+
+
+class ComputedField(serializers.ReadOnlyField):
+    """
+    Placeholder that keeps a key's position in the output
+    The serializer's to_representation fills in the value
+    """
+    
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        return None
+
+
 class FileBlobSerializer(serializers.ModelSerializer):
     """File blob information"""
     size_mb = serializers.SerializerMethodField()
-    reference_count = serializers.SerializerMethodField()
     referenced_by_projects = serializers.SerializerMethodField()
     
     class Meta:
         model = FileBlob
-        fields = ['id', 'hash', 'size', 'size_mb', 'ref_count', 'reference_count', 'referenced_by_projects', 'created_at']
-        read_only_fields = ['created_at', 'ref_count', 'reference_count', 'referenced_by_projects']
+        fields = ['id', 'hash', 'size', 'size_mb', 'ref_count', 'referenced_by_projects', 'created_at']
+        read_only_fields = ['created_at', 'ref_count', 'referenced_by_projects']
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Prefetch references with their projects (2 queries for the whole page)"""
+        return queryset.prefetch_related(
+            Prefetch(
+                'references',
+                queryset=BlobReference.objects.select_related('project').only(
+                    'id', 'blob_id', 'project__id', 'project__name'
+                ),
+                to_attr='_prefetched_refs'
+            )
+        )
     
     def get_size_mb(self, obj):
         return obj.get_size_mb()
     
-    def get_reference_count(self, obj):
-        """Get actual count of active references"""
-        return obj.get_reference_count()
-    
     def get_referenced_by_projects(self, obj):
         """Get list of projects that reference this blob"""
-        refs = BlobReference.objects.filter(blob=obj).distinct('project')
-        return [ref.project.name for ref in refs]
+        refs = getattr(obj, '_prefetched_refs', None)
+        if refs is None:
+            # Plain tuples, deduplicated by the database
+            rows = BlobReference.objects.filter(blob=obj).values_list(
+                'project_id', 'project__name'
+            ).distinct()
+            return [name for _, name in rows]
+        projects = {}
+        for ref in refs:
+            projects.setdefault(ref.project_id, ref.project.name)
+        return list(projects.values())
 
 
 class VersionSerializer(serializers.ModelSerializer):
     """Version with detailed change information"""
     uid = serializers.CharField(read_only=True)
     version_number = serializers.IntegerField(read_only=True)
-    file_size_mb = serializers.SerializerMethodField()
+    file_size_mb = serializers.ReadOnlyField()
     file_url = serializers.SerializerMethodField()
-    storage_type = serializers.SerializerMethodField()
+    storage_type = serializers.ReadOnlyField(source='get_storage_type')
     project_name = serializers.CharField(source='project.name', read_only=True)
     project_uid = serializers.CharField(source='project.uid', read_only=True)
     project_id = serializers.IntegerField(source='project.id', read_only=True)
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     manifest_summary = serializers.SerializerMethodField()
-    is_ready = serializers.SerializerMethodField()
-    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    is_ready = serializers.ReadOnlyField()
+    status_display = serializers.ReadOnlyField(source='status')  # labelled in to_representation
     
     # Detailed change tracking
     change_summary = serializers.SerializerMethodField()
-    size_change_mb = serializers.SerializerMethodField()
+    size_change_mb = serializers.ReadOnlyField()
     previous_version_number = serializers.SerializerMethodField()
     
     class Meta:
@@ -75,94 +143,42 @@ class VersionSerializer(serializers.ModelSerializer):
             'files_deleted', 'size_change', 'previous_version', 'version_number'
         ]
     
-    def get_file_size_mb(self, obj):
-        return obj.get_file_size_mb()
-    
-    def get_size_change_mb(self, obj):
-        return obj.get_size_change_mb()
-    
     def get_previous_version_number(self, obj):
         if obj.previous_version and obj.previous_version.version_number:
             return obj.previous_version.version_number
         return None
     
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        ret['status_display'] = VERSION_STATUS_LABELS.get(instance.status, instance.status)
+        return ret
+    
     def get_file_url(self, obj):
         if obj.file and obj.is_snapshot and obj.status == 'completed':
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.file.url)
-            return obj.file.url
+            return build_absolute_url(self, obj.file.url)
         return None
     
-    def get_storage_type(self, obj):
-        return obj.get_storage_type()
-    
-    def get_is_ready(self, obj):
-        return obj.is_ready()
-    
     def get_manifest_summary(self, obj):
-        if obj.is_snapshot:
-            return {
-                'type': 'snapshot',
-                'message': 'Full ZIP snapshot'
-            }
-        
-        manifest = obj.load_manifest_from_file()
-        if not manifest:
-            return {
-                'type': 'cas',
-                'message': 'Manifest not available'
-            }
-        
-        files = manifest.get('files', [])
-        cas_files = [f for f in files if f.get('storage') == 'cas']
-        inline_files = [f for f in files if f.get('storage') == 'inline']
-        
-        return {
-            'type': 'cas',
-            'total_files': len(files),
-            'cas_files': len(cas_files),
-            'inline_files': len(inline_files),
-            'cas_threshold_mb': manifest.get('cas_threshold_mb')
-        }
+        return obj.get_manifest_summary()
     
     def get_change_summary(self, obj):
         """Get detailed change summary with file names"""
-        summary = obj.get_change_summary()
-        
         # Limit number of files shown to prevent huge responses
-        max_files = 50
-        
-        if summary.get('added_files'):
-            summary['added_files'] = summary['added_files'][:max_files]
-            if len(summary.get('added_files', [])) >= max_files:
-                summary['added_files_truncated'] = True
-        
-        if summary.get('modified_files'):
-            summary['modified_files'] = summary['modified_files'][:max_files]
-            if len(summary.get('modified_files', [])) >= max_files:
-                summary['modified_files_truncated'] = True
-        
-        if summary.get('deleted_files'):
-            summary['deleted_files'] = summary['deleted_files'][:max_files]
-            if len(summary.get('deleted_files', [])) >= max_files:
-                summary['deleted_files_truncated'] = True
-        
-        return summary
+        return obj.get_change_summary(max_files=50)
 
 
 class VersionListSerializer(serializers.ModelSerializer):
     """Lightweight version list with change summary"""
     uid = serializers.CharField(read_only=True)
     version_number = serializers.IntegerField(read_only=True)
-    file_size_mb = serializers.SerializerMethodField()
-    storage_type = serializers.SerializerMethodField()
+    file_size_mb = serializers.ReadOnlyField()
+    storage_type = serializers.ReadOnlyField(source='storage_type_short')
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
-    is_ready = serializers.SerializerMethodField()
-    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    is_ready = serializers.ReadOnlyField()
+    status_display = serializers.ReadOnlyField(source='status')  # labelled in to_representation
     
-    size_change_mb = serializers.SerializerMethodField()
-    has_changes = serializers.SerializerMethodField()
+    size_change_mb = serializers.ReadOnlyField()
+    has_changes = serializers.ReadOnlyField()
     
     class Meta:
         model = Version
@@ -177,38 +193,83 @@ class VersionListSerializer(serializers.ModelSerializer):
             'size_change_mb', 'has_changes'
         ]
     
-    def get_file_size_mb(self, obj):
-        return obj.get_file_size_mb()
-    
-    def get_size_change_mb(self, obj):
-        return obj.get_size_change_mb()
-    
-    def get_storage_type(self, obj):
-        return 'Snapshot' if obj.is_snapshot else 'CAS'
-    
-    def get_is_ready(self, obj):
-        return obj.is_ready()
-    
-    def get_has_changes(self, obj):
-        return (obj.files_added + obj.files_modified + obj.files_deleted) > 0
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        ret['status_display'] = VERSION_STATUS_LABELS.get(instance.status, instance.status)
+        return ret
+
+
+# Columns version_list_rows() reads
+VERSION_LIST_VALUES = (
+    'id', 'uid', 'version_number', 'commit_message', 'status', 'is_snapshot',
+    'file_size', 'file_count', 'created_at', 'completed_at', 'created_by__username',
+    'files_added', 'files_modified', 'files_deleted', 'size_change',
+)
+
+_MEGABYTE = 1024 * 1024
+
+# VersionListSerializer fields that are not a plain column, computed from the
+# values() row the same way the Version properties compute them
+VERSION_LIST_COMPUTED = {
+    'status_display': lambda row: VERSION_STATUS_LABELS.get(row['status'], row['status']),
+    'is_ready': lambda row: row['status'] == 'completed',
+    'storage_type': lambda row: 'Snapshot' if row['is_snapshot'] else 'CAS',
+    'file_size_mb': lambda row: round(row['file_size'] / _MEGABYTE, 2) if row['file_size'] else 0,
+    'created_by_username': lambda row: row['created_by__username'],
+    'size_change_mb': lambda row: round(row['size_change'] / _MEGABYTE, 2) if row['size_change'] else 0,
+    'has_changes': lambda row: (row['files_added'] + row['files_modified'] + row['files_deleted']) > 0,
+}
+
+
+def version_list_rows(queryset, chunk_size=None):
+    """
+    Yield VersionListSerializer's output for each version in queryset, built
+    from values() dicts instead of Version instances
+    Keys and their order come from the serializer's fields; plain columns are
+    formatted by the serializer's own field, the rest by VERSION_LIST_COMPUTED.
+    A field that is neither fails on the first row instead of drifting.
+    Pass chunk_size to stream with iterator()
+    """
+    plan = []
+    for name, field in VersionListSerializer().fields.items():
+        compute = VERSION_LIST_COMPUTED.get(name)
+        if compute is not None:
+            plan.append((name, compute, None))
+        else:
+            source = field.source
+            plan.append((name, lambda row, source=source: row[source], field.to_representation))
+    
+    values = queryset.values(*VERSION_LIST_VALUES)
+    if chunk_size:
+        values = values.iterator(chunk_size=chunk_size)
+    
+    for row in values:
+        ret = {}
+        for name, get, represent in plan:
+            value = get(row)
+            ret[name] = represent(value) if represent is not None and value is not None else value
+        if ret['created_by_username'] is None:
+            # Creator deleted - the serializer leaves the key out
+            del ret['created_by_username']
+        yield ret
 
 
 class DownloadRequestSerializer(serializers.ModelSerializer):
     """Download request with UID"""
     uid = serializers.CharField(read_only=True)
-    version_number = serializers.SerializerMethodField()
+    version_number = serializers.IntegerField(source='version.version_number', read_only=True)
     version_uid = serializers.CharField(source='version.uid', read_only=True)
     project_name = serializers.CharField(source='version.project.name', read_only=True)
     project_uid = serializers.CharField(source='version.project.uid', read_only=True)
     project_id = serializers.IntegerField(source='version.project.id', read_only=True)
     requested_by_username = serializers.CharField(source='requested_by.username', read_only=True)
-    download_url = serializers.SerializerMethodField()
-    file_size_mb = serializers.SerializerMethodField()
-    is_expired = serializers.SerializerMethodField()
-    time_remaining_seconds = serializers.SerializerMethodField()
-    time_remaining_formatted = serializers.SerializerMethodField()
-    expiration_hours = serializers.SerializerMethodField()
-    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = ComputedField()
+    file_size_mb = serializers.ReadOnlyField()
+    is_expired = ComputedField()
+    time_remaining_seconds = ComputedField()
+    time_remaining_formatted = ComputedField()
+    expiration_hours = serializers.ReadOnlyField(source='EXPIRATION_HOURS')
+    status_display = serializers.ReadOnlyField(source='status')  # labelled in to_representation
     
     class Meta:
         model = DownloadRequest
@@ -229,33 +290,102 @@ class DownloadRequestSerializer(serializers.ModelSerializer):
             'error_details'
         ]
     
-    def get_version_number(self, obj):
-        return obj.version.version_number
-    
-    def get_download_url(self, obj):
-        if obj.status == 'completed' and not obj.is_expired():
-            request = self.context.get('request')
-            if request and obj.zip_file:
-                return request.build_absolute_uri(obj.zip_file.url)
-            return obj.get_download_url()
-        return None
-    
-    def get_file_size_mb(self, obj):
-        if obj.file_size:
-            return round(obj.file_size / (1024 * 1024), 2)
-        return None
-    
-    def get_is_expired(self, obj):
-        return obj.is_expired()
-    
-    def get_time_remaining_seconds(self, obj):
-        return obj.get_time_remaining_seconds()
-    
-    def get_time_remaining_formatted(self, obj):
-        return obj.get_time_remaining_formatted()
-    
-    def get_expiration_hours(self, obj):
-        return obj.EXPIRATION_HOURS
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Join version, project and requester (read by every row), leaving the
+        version's change_details JSON unloaded
+        """
+        return queryset.select_related(
+            'version', 'version__project', 'version__project__owner', 'requested_by'
+        ).defer('version__change_details')
+    
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        ret['status_display'] = DOWNLOAD_STATUS_LABELS.get(instance.status, instance.status)
+        
+        # Expiry is evaluated once per row against the serializer's clock
+        now = get_serializer_now(self)
+        expired = instance.is_expired(now)
+        remaining = instance.get_time_remaining_seconds(now)
+        ret['is_expired'] = expired
+        ret['time_remaining_seconds'] = remaining
+        ret['time_remaining_formatted'] = instance.format_time_remaining(remaining)
+        
+        download_url = None
+        if instance.status == 'completed' and not expired and instance.zip_file:
+            download_url = build_absolute_url(self, instance.zip_file.url)
+        ret['download_url'] = download_url
+        return ret
+
+
+def source_values_paths(model, sources):
+    """
+    values() paths of the model columns behind dotted serializer sources
+    ('version.project.name' -> 'version_id', 'version__project_id',
+    'version__project__name'); sources that are not columns are skipped
+    """
+    paths = []
+    for source in sources:
+        current = model
+        prefix = ''
+        for attr in source.split('.'):
+            try:
+                field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not field.concrete:
+                break
+            paths.append(prefix + field.attname)
+            if not field.is_relation:
+                break
+            prefix += attr + '__'
+            current = field.related_model
+    return list(dict.fromkeys(paths))
+
+
+def instance_from_values(model, row, db):
+    """
+    Model instance built from a values() dict whose keys are source_values_paths()
+    paths, with related instances cached on their foreign keys
+    Columns missing from row are deferred, so reading one costs a query
+    instead of returning a wrong value
+    """
+    local = {}
+    related = {}
+    for key, value in row.items():
+        head, sep, rest = key.partition('__')
+        if sep:
+            related.setdefault(head, {})[rest] = value
+        else:
+            local[key] = value
+    
+    field_names = [f.attname for f in model._meta.concrete_fields if f.attname in local]
+    instance = model.from_db(db, field_names, [local[name] for name in field_names])
+    
+    for name, sub_row in related.items():
+        field = model._meta.get_field(name)
+        related_model = field.related_model
+        sub_row.setdefault(related_model._meta.pk.attname, local.get(field.attname))
+        field.set_cached_value(instance, instance_from_values(related_model, sub_row, db))
+    return instance
+
+
+# Columns DownloadRequestSerializer.to_representation reads beyond its
+# fields' sources, plus the owner the status view checks permissions with
+DOWNLOAD_STATUS_EXTRA_VALUES = ('id', 'zip_file', 'expires_at', 'version__project__owner_id')
+
+
+@functools.lru_cache(maxsize=None)
+def download_status_values():
+    """values() columns for a download status poll, derived from DownloadRequestSerializer's fields"""
+    sources = [
+        field.source for field in DownloadRequestSerializer().fields.values()
+        if field.source != '*'
+    ]
+    return tuple(dict.fromkeys(
+        source_values_paths(DownloadRequest, sources) + list(DOWNLOAD_STATUS_EXTRA_VALUES)
+    ))
 
 
 class PendingPushSerializer(serializers.ModelSerializer):
@@ -266,6 +396,7 @@ class PendingPushSerializer(serializers.ModelSerializer):
     project_id = serializers.IntegerField(source='project.id', read_only=True)
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     approved_by_username = serializers.CharField(source='approved_by.username', read_only=True, allow_null=True)
+    file_list = serializers.SerializerMethodField()
     is_active = serializers.SerializerMethodField()
     duration = serializers.SerializerMethodField()
     version_number = serializers.SerializerMethodField()
@@ -293,12 +424,18 @@ class PendingPushSerializer(serializers.ModelSerializer):
             'approved_by', 'approved_at'
         ]
     
+    def get_file_list(self, obj):
+        try:
+            return obj.get_file_list()
+        except FileNotFoundError:
+            # Offloaded list lost - show it as unavailable instead of failing the response
+            return None
+    
     def get_is_active(self, obj):
         return obj.is_active()
     
     def get_duration(self, obj):
-        from django.utils import timezone
-        end_time = obj.completed_at or timezone.now()
+        end_time = obj.completed_at or get_serializer_now(self)
         duration = (end_time - obj.created_at).total_seconds()
         return round(duration, 2)
     
@@ -324,6 +461,26 @@ class PendingPushSerializer(serializers.ModelSerializer):
         )
 
 
+
+class PendingPushListSerializer(PendingPushSerializer):
+    """Push queue rows - no file_list/error_details (fetch a push for those)"""
+    
+    class Meta(PendingPushSerializer.Meta):
+        fields = [
+            name for name in PendingPushSerializer.Meta.fields
+            if name not in ('file_list', 'error_details')
+        ]
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Join the related rows the list reads and leave the large
+        file_list/error_details columns in the database
+        """
+        return queryset.select_related(
+            'project', 'project__owner', 'created_by', 'approved_by', 'version'
+        ).defer('file_list', 'error_details')
+
 class VersionUploadSerializer(serializers.Serializer):
     """Version upload from plugin"""
     project_name = serializers.CharField(max_length=255)
@@ -5,24 +5,30 @@ VERIFIED FIX: Direct inline path construction to ensure correct format
 
 import os
 import hashlib
-import shutil
+import mmap
 import fnmatch
-import base64
+import functools
+import re
+import time
 import json
-import zipfile
 import logging
+from collections import Counter
+from operator import itemgetter
+from json.encoder import encode_basestring_ascii
 from celery import shared_task
 from django.conf import settings
 from django.utils import timezone
-from django.core.files.base import ContentFile
 from django.core.files import File
+from django.core.files.storage import FileSystemStorage
 from django.db import transaction
+from django.db.models import Case, F, Value, When
 
 from .models import (
     PendingPush,
     Version,
     FileBlob,
     BlobReference,
+    manifest_file_list,
 )
 
 logger = logging.getLogger(__name__)
@@ -30,13 +36,58 @@ logger = logging.getLogger(__name__)
 CAS_SIZE_THRESHOLD = 1 * 1024 * 1024
 SNAPSHOT_INTERVAL = 10
 
+# Clients send SHA-256 file hashes with each push and FileBlob.hash stores
+# them, so server-side hashing has to use the same algorithm
+FILE_HASH_ALGORITHM = 'sha256'
+
+# hashlib releases the GIL while digesting, so files hash in parallel threads
+HASH_MAX_WORKERS = os.cpu_count() or 1
+
+# Files up to this size are hashed from a single read(); file_digest would
+# allocate a buffer this large for each of them anyway
+HASH_ONESHOT_MAX = 256 * 1024
+
+# Storage write chunk for new CAS blobs (Django's File default is 64 KiB)
+BLOB_WRITE_CHUNK_SIZE = 1024 * 1024
+
+# mmap window for the pre-3.11 hashing fallback (fits 32-bit address spaces)
+MMAP_WINDOW_SIZE = 1 << 30
+
+# Copied files between push progress updates / cancellation checks
+PUSH_PROGRESS_EVERY = 10
+
+# Minimum seconds between copy-loop cancel checks / progress writes, and
+# between throttled writes that leave the percentage unchanged
+PUSH_PROGRESS_MIN_INTERVAL = 1.0
+
+# Pushes with at least this many files to hash or copy fan that work out as a
+# chord of sync_push_files batches (all workers must share MEDIA_ROOT and the
+# upload paths)
+PUSH_CHORD_MIN_FILES = getattr(settings, 'PUSH_CHORD_MIN_FILES', 500)
+PUSH_CHORD_BATCH_SIZE = getattr(settings, 'PUSH_CHORD_BATCH_SIZE', 100)
+
+# Distinct ignore-pattern lists whose compiled regex is kept per worker
+IGNORE_PATTERN_CACHE_SIZE = 256
+# End anchor fnmatch.translate() appends (\Z up to Python 3.13, \z from 3.14)
+FNMATCH_END_ANCHOR_RE = re.compile(r'\\[Zz]$')
+
+# Whether os.path.normcase rewrites paths (Windows) or is the identity (POSIX)
+NORMCASE_PATHS = os.path.normcase('A/b') != 'A/b'
+
+# Stat-keyed hash cache kept next to each project's master directory
+HASH_CACHE_FILENAME = 'master_hashes.json'
+
+
+# Anything but letters, digits, '-' and '_' (\w matches exactly what str.isalnum
+# accepts, plus '_')
+UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w-]')
+
 
 def sanitize_filename(name):
     """Sanitize filename/folder name - remove problematic characters"""
     if not name:
         return 'unknown'
-    name = ''.join(char if char.isalnum() or char in '-_' else '_' for char in name)
-    return name[:50]
+    return UNSAFE_FILENAME_CHARS_RE.sub('_', name[:50])
 
 
 def get_project_master_path_inline(project):
@@ -70,29 +121,242 @@ def get_project_master_path_inline(project):
 
 
 def compute_file_hash(file_path):
-    """Compute SHA256 hash of a file"""
-    sha256 = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+    """
+    Compute SHA256 hash of a file
+    The digest loop runs in C: small files in one read, larger ones with
+    hashlib.file_digest on Python 3.11+, otherwise one update() over an
+    mmap of the file
+    """
+    with open(file_path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= HASH_ONESHOT_MAX:
+            return hashlib.new(FILE_HASH_ALGORITHM, f.read()).hexdigest()
+
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, FILE_HASH_ALGORITHM).hexdigest()
+        
+        digest = hashlib.new(FILE_HASH_ALGORITHM)
+        # Map in windows so 32-bit address spaces are not exhausted;
+        # an empty file maps nothing (mmap rejects length 0)
+        for offset in range(0, size, MMAP_WINDOW_SIZE):
+            length = min(MMAP_WINDOW_SIZE, size - offset)
+            with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=offset) as mapped:
+                if hasattr(mapped, 'madvise'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                digest.update(mapped)
+        return digest.hexdigest()
+
+
+def compute_file_hashes(file_paths):
+    """
+    Hash a batch of files, largest first, spread over HASH_MAX_WORKERS threads
+    Missing/unreadable files are left out of the result
+
+    Returns:
+        dict mapping file path -> hex digest
+    """
+    sized = []
+    for file_path in file_paths:
+        try:
+            sized.append((os.stat(file_path).st_size, file_path))
+        except OSError:
+            continue
+    # Largest first so one big file does not finish the batch alone
+    sized.sort(reverse=True)
+    paths = [file_path for _, file_path in sized]
+
+    def _hash(file_path):
+        try:
+            return file_path, compute_file_hash(file_path)
+        except OSError:
+            return file_path, None
+
+    workers = min(HASH_MAX_WORKERS, len(paths))
+    if workers < 2:
+        results = map(_hash, paths)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_hash, paths))
+
+    return {file_path: digest for file_path, digest in results if digest is not None}
+
+
+class MasterHashCache:
+    """
+    Remembers the hash of each master file under its (inode, mtime_ns, size)
+    so files untouched since the last push are not hashed again.
+    Stored as JSON beside the master directory (not inside it, where the
+    push would treat it as a deleted file).
+    """
+
+    def __init__(self, master_dir):
+        self.path = os.path.join(os.path.dirname(master_dir), HASH_CACHE_FILENAME)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.dirty = False
+
+    @staticmethod
+    def _stat_key(file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+    def get(self, rel_path, file_path):
+        """Cached hash if the file is unchanged, otherwise None"""
+        entry = self.entries.get(rel_path)
+        if entry and entry[:3] == self._stat_key(file_path):
+            return entry[3]
+        return None
+
+    def set(self, rel_path, file_path, digest):
+        key = self._stat_key(file_path)
+        if key is not None:
+            self.entries[rel_path] = key + [digest]
+            self.dirty = True
+
+    def retain(self, rel_paths):
+        """Drop entries for files no longer in the master"""
+        stale = self.entries.keys() - rel_paths
+        for rel_path in stale:
+            del self.entries[rel_path]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        if not self.dirty:
+            return
+        # A unique temp name per save, so two workers finishing pushes to
+        # the same master never write through each other's temp file
+        import tempfile
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=HASH_CACHE_FILENAME + '.', suffix='.tmp', dir=os.path.dirname(self.path)
+            )
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            logger.warning(f"Could not save hash cache {self.path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def prune_master_dir(master_dir, keep):
+    """
+    Remove master files whose relative path is not in keep, and the
+    directories that leaves empty, in one os.scandir pass (bottom-up per
+    directory, so no second walk is needed for the empty-dir sweep)
+    Directories that hold no kept path are emptied without any per-file
+    membership checks
+
+    Returns:
+        Number of files removed
+    """
+    removed = 0
+
+    # Every directory prefix ("a/", "a/b/") that leads to a kept file
+    keep_dirs = set()
+    for rel_path in keep:
+        end = rel_path.rfind('/')
+        while end > 0:
+            prefix = rel_path[:end + 1]
+            if prefix in keep_dirs:
+                break
+            keep_dirs.add(prefix)
+            end = rel_path.rfind('/', 0, end)
+
+    def _prune(dir_path, rel_prefix, drop_all=False):
+        """Prune one directory; True if it ended up empty"""
+        nonlocal removed
+        remaining = 0
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError as e:
+            logger.error(f"Error scanning {dir_path}: {e}")
+            return False
+
+        for entry in entries:
+            rel = rel_prefix + entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if is_dir:
+                sub_prefix = rel + '/'
+                if _prune(entry.path, sub_prefix, drop_all or sub_prefix not in keep_dirs):
+                    try:
+                        os.rmdir(entry.path)
+                        continue
+                    except OSError:
+                        pass
+                remaining += 1
+            elif not drop_all and rel in keep:
+                remaining += 1
+            else:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except Exception as e:
+                    logger.error(f"Error removing {entry.path}: {e}")
+                    remaining += 1
+        return remaining == 0
+
+    _prune(master_dir, '')
+    return removed
+
+
+def _json_scalar(value):
+    """json.dumps() of a str/int without the generic encoder dispatch"""
+    if value.__class__ is str:
+        return encode_basestring_ascii(value)
+    if value.__class__ is int:
+        return int.__repr__(value)
+    return json.dumps(value)
 
 
 def compute_manifest_hash(manifest):
-    """Compute hash of manifest for duplicate detection"""
-    files = manifest.get('files', [])
-    file_hashes = []
-    
-    for f in files:
-        file_hashes.append({
-            'path': f.get('path'),
-            'hash': f.get('hash'),
-            'size': f.get('size')
-        })
-    
-    file_hashes.sort(key=lambda x: x['path'])
-    manifest_str = json.dumps(file_hashes, sort_keys=True)
-    return hashlib.sha256(manifest_str.encode()).hexdigest()
+    """
+    Compute hash of manifest for duplicate detection
+    SHA-256 of json.dumps(sorted [{hash, path, size}], sort_keys=True); each
+    record's JSON is fed to the digest as it is formatted (byte-identical, so
+    existing version hashes still match) instead of joining one big string
+    """
+    rows = sorted(
+        ((f.get('path'), f.get('hash'), f.get('size')) for f in manifest.get('files', [])),
+        key=lambda row: row[0]
+    )
+    digest = hashlib.sha256(b'[')
+    separator = b''
+    for path, file_hash, size in rows:
+        digest.update(separator)
+        digest.update((
+            '{"hash": %s, "path": %s, "size": %s}'
+            % (_json_scalar(file_hash), _json_scalar(path), _json_scalar(size))
+        ).encode())
+        separator = b', '
+    digest.update(b']')
+    return digest.hexdigest()
+
+
+def _sorted_by_path(entries):
+    """
+    Manifest entries sorted by path for a merge diff; a repeated path keeps
+    its last entry (as a {path: entry} dict would)
+    """
+    result = []
+    for entry in sorted(entries, key=itemgetter('path')):
+        if result and result[-1]['path'] == entry['path']:
+            result[-1] = entry
+        else:
+            result.append(entry)
+    return result
 
 
 def compare_with_previous_version(current_manifest, previous_version):
@@ -121,8 +385,19 @@ def compare_with_previous_version(current_manifest, previous_version):
         
         return len(current_files), 0, 0, total_size, change_details
     
-    prev_manifest = previous_version.load_manifest_from_file()
-    if not prev_manifest:
+    # The file list sidecar carries path/size/hash without the inline
+    # base64 content; a version saved before it existed gets one written
+    # from its manifest, so only the first diff against it pays for that
+    prev_entries = previous_version.load_file_list_from_file()
+    if prev_entries is None:
+        prev_manifest = previous_version.load_manifest_from_file()
+        if prev_manifest:
+            try:
+                prev_entries = previous_version.write_file_list_sidecar(prev_manifest)
+            except OSError as e:
+                logger.warning(f"Could not write file list sidecar: {e}")
+                prev_entries = manifest_file_list(prev_manifest)
+    if prev_entries is None:
         current_files = current_manifest.get('files', [])
         total_size = sum(f.get('size', 0) for f in current_files)
         
@@ -143,50 +418,60 @@ def compare_with_previous_version(current_manifest, previous_version):
         
         return len(current_files), 0, 0, total_size, change_details
     
-    current_files = {f['path']: f for f in current_manifest.get('files', [])}
-    prev_files = {f['path']: f for f in prev_manifest.get('files', [])}
+    current_files = _sorted_by_path(current_manifest.get('files', []))
+    prev_files = _sorted_by_path(prev_entries)
     
-    files_added = 0
     files_modified = 0
-    files_deleted = 0
     size_change = 0
     
     added_files = []
     modified_files = []
     deleted_files = []
     
-    for path, current_file in current_files.items():
-        if path not in prev_files:
-            files_added += 1
-            size_change += current_file.get('size', 0)
-            added_files.append({
-                'path': path,
-                'size': current_file.get('size', 0),
-                'hash': current_file.get('hash')
-            })
-        else:
-            prev_file = prev_files[path]
+    # Single merge pass over both path-sorted lists; matching paths (the
+    # common case) are tested first and the unmatched tails are drained after
+    i = j = 0
+    n_current, n_prev = len(current_files), len(prev_files)
+    while i < n_current and j < n_prev:
+        current_file = current_files[i]
+        prev_file = prev_files[j]
+        current_path = current_file['path']
+        prev_path = prev_file['path']
+        
+        if current_path == prev_path:
             if current_file.get('hash') != prev_file.get('hash'):
                 files_modified += 1
                 size_change += current_file.get('size', 0) - prev_file.get('size', 0)
                 modified_files.append({
-                    'path': path,
+                    'path': current_path,
                     'old_size': prev_file.get('size', 0),
                     'new_size': current_file.get('size', 0),
                     'size_change': current_file.get('size', 0) - prev_file.get('size', 0),
                     'old_hash': prev_file.get('hash'),
                     'new_hash': current_file.get('hash')
                 })
+            i += 1
+            j += 1
+        elif current_path < prev_path:
+            added_files.append(current_file)
+            i += 1
+        else:
+            deleted_files.append(prev_file)
+            j += 1
+    added_files.extend(current_files[i:])
+    deleted_files.extend(prev_files[j:])
     
-    for path, prev_file in prev_files.items():
-        if path not in current_files:
-            files_deleted += 1
-            size_change -= prev_file.get('size', 0)
-            deleted_files.append({
-                'path': path,
-                'size': prev_file.get('size', 0),
-                'hash': prev_file.get('hash')
-            })
+    added_files = [
+        {'path': f['path'], 'size': f.get('size', 0), 'hash': f.get('hash')}
+        for f in added_files
+    ]
+    deleted_files = [
+        {'path': f['path'], 'size': f.get('size', 0), 'hash': f.get('hash')}
+        for f in deleted_files
+    ]
+    files_added = len(added_files)
+    files_deleted = len(deleted_files)
+    size_change += sum(f['size'] for f in added_files) - sum(f['size'] for f in deleted_files)
     
     change_details = {
         'added_files': added_files,
@@ -199,27 +484,77 @@ def compare_with_previous_version(current_manifest, previous_version):
     return files_added, files_modified, files_deleted, size_change, change_details
 
 
-def update_push_progress(push: PendingPush, status: str, progress: int, message: str = None):
-    """Update push status and progress"""
+def update_push_progress(push: PendingPush, status: str, progress: int, message: str = None,
+                         throttle: bool = False):
+    """
+    Update push status and progress
+    Only the progress columns are written, not the (possibly large) file list.
+    With throttle, the write is skipped unless the status or whole percent
+    changed or PUSH_PROGRESS_MIN_INTERVAL has passed since the last one
+    """
+    now = time.monotonic()
+    if throttle and status == push.status and progress == push.progress:
+        if now - getattr(push, '_last_progress_at', 0) < PUSH_PROGRESS_MIN_INTERVAL:
+            return
+
     push.status = status
     push.progress = progress
     if message is not None:
         push.message = message
-    push.save()
-    logger.info(f"Push {push.uid}: {status}, {progress}%, {message}")
+    push.save(update_fields=['status', 'progress', 'message'])
+    push._last_progress_at = now
 
+    if throttle:
+        logger.debug(f"Push {push.uid}: {status}, {progress}%, {message}")
+    else:
+        logger.info(f"Push {push.uid}: {status}, {progress}%, {message}")
 
-def should_ignore_file(rel_path, ignore_patterns):
-    """Check if file should be ignored"""
+
+def compile_ignore_patterns(ignore_patterns, whole_path=False):
+    """
+    Compile fnmatch-style ignore patterns into one anchored regex
+    A path is ignored when a pattern matches the whole path or any leading
+    run of its segments ("build" ignores "build/x.wav"), which the
+    (?:/|\\Z) tail expresses without trying each prefix separately.
+    With whole_path, a pattern has to match the entire path (plain fnmatch).
+    Compiled regexes are kept per pattern list, so pushes and uploads for
+    the same project reuse them.
+    """
+    return _compile_ignore_patterns(tuple(ignore_patterns), whole_path)
+
+
+@functools.lru_cache(maxsize=IGNORE_PATTERN_CACHE_SIZE)
+def _compile_ignore_patterns(ignore_patterns, whole_path):
+    alternatives = []
     for pattern in ignore_patterns:
-        if fnmatch.fnmatch(rel_path, pattern):
-            return True
-        path_parts = rel_path.split('/')
-        for i in range(len(path_parts)):
-            partial_path = '/'.join(path_parts[:i+1])
-            if fnmatch.fnmatch(partial_path, pattern):
-                return True
-    return False
+        alternatives.append(FNMATCH_END_ANCHOR_RE.sub('', fnmatch.translate(os.path.normcase(pattern))))
+    tail = '\\Z' if whole_path else '(?:/|\\Z)'
+    return re.compile('(?:%s)%s' % ('|'.join(alternatives), tail))
+
+
+def ignore_matcher(ignore_patterns):
+    """
+    Predicate telling whether a relative path is ignored
+    On POSIX normcase is the identity, so the compiled regex's bound match is
+    used directly instead of paying a normcase call per file
+    """
+    match = compile_ignore_patterns(ignore_patterns).match
+    if not NORMCASE_PATHS:
+        return match
+    normcase = os.path.normcase
+    return lambda rel_path: match(normcase(rel_path))
+
+
+def should_ignore_file(rel_path, ignore_patterns):
+    """
+    Check if file should be ignored
+    ignore_patterns is a pattern list or a compile_ignore_patterns() regex
+    """
+    if not hasattr(ignore_patterns, 'match'):
+        if not ignore_patterns:
+            return False
+        ignore_patterns = compile_ignore_patterns(ignore_patterns)
+    return ignore_patterns.match(os.path.normcase(rel_path)) is not None
 
 
 def should_create_snapshot(version_number):
@@ -227,88 +562,245 @@ def should_create_snapshot(version_number):
     return version_number % SNAPSHOT_INTERVAL == 0
 
 
-def get_or_create_blob(file_path, file_hash):
-    """Get or create blob for file"""
-    try:
-        blob = FileBlob.objects.get(hash=file_hash)
-        logger.info(f"Using existing blob: {file_hash[:16]}...")
-        return blob
-    except FileBlob.DoesNotExist:
-        pass
-
-    file_size = os.path.getsize(file_path)
-    logger.info(f"Creating blob: {file_hash[:16]}... ({round(file_size / 1024 / 1024, 2)} MB)")
+def ref_count_delta(counts):
+    """
+    Expression adding counts[blob_id] to each blob's ref_count; blobs that
+    share a count share one WHEN, so one UPDATE covers every blob
+    """
+    by_count = {}
+    for blob_id, count in counts.items():
+        by_count.setdefault(count, []).append(blob_id)
+    return Case(
+        *(When(id__in=ids, then=Value(count)) for count, ids in by_count.items()),
+        default=Value(0)
+    )
 
-    with open(file_path, 'rb') as f:
-        file_content = f.read()
 
-    blob = FileBlob(hash=file_hash, size=file_size, ref_count=0)
-    blob.file.save(file_hash, ContentFile(file_content), save=True)
-    return blob
+def store_blob_file_local(blob, file_path):
+    """
+    Copy a new CAS blob straight into local filesystem storage
+    The storage name is reserved with O_EXCL (as FileSystemStorage._save does)
+    and the bytes are copied with fast_copy_file, so the kernel moves them
+    without Django's read/write chunk loop
+    """
+    from .restore_utils import fast_copy_file
+
+    storage = blob.file.storage
+    base_name = blob.file.field.generate_filename(blob, blob.hash)
+    while True:
+        name = storage.get_available_name(base_name)
+        full_path = storage.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        try:
+            os.close(os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+            break
+        except FileExistsError:
+            # Another worker claimed the name between the check and the open
+            continue
 
+    try:
+        fast_copy_file(file_path, full_path)
+        if storage.file_permissions_mode is not None:
+            os.chmod(full_path, storage.file_permissions_mode)
+    except Exception:
+        try:
+            os.remove(full_path)
+        except OSError:
+            pass
+        raise
+    blob.file.name = name.replace('\\', '/')
 
-def create_cas_manifest(file_list, master_dir):
-    """Create CAS manifest"""
-    manifest = {
-        'files': [],
-        'created_at': timezone.now().isoformat(),
-        'cas_threshold_mb': CAS_SIZE_THRESHOLD / (1024 * 1024)
-    }
 
-    total_size = 0
-    cas_count = 0
-    inline_count = 0
+def get_or_create_blobs(files_by_hash):
+    """
+    Get or create the CAS blobs for {hash: (file_path, file_size)} with a fixed number of
+    queries: one lookup, one bulk insert for the new rows and one re-read
+    for their IDs. New blob files are written to storage on a thread pool.
 
-    for file_entry in file_list:
-        rel_path = file_entry.get('relative_path')
-        file_hash = file_entry.get('hash')
-        if not rel_path:
+    Returns:
+        dict mapping hash -> FileBlob (hashes whose file could not be stored are missing)
+    """
+    blobs = FileBlob.objects.only('id', 'hash', 'file').in_bulk(list(files_by_hash), field_name='hash')
+    missing = [file_hash for file_hash in files_by_hash if file_hash not in blobs]
+    logger.info(f"Blobs: {len(blobs)} existing, {len(missing)} to create")
+    if not missing:
+        return blobs
+
+    def _store(file_hash):
+        file_path, file_size = files_by_hash[file_hash]
+        try:
+            blob = FileBlob(hash=file_hash, size=file_size, ref_count=0)
+            if isinstance(blob.file.storage, FileSystemStorage):
+                store_blob_file_local(blob, file_path)
+                return blob
+            # A File (not ContentFile) is streamed to storage, 1 MiB per chunk
+            with open(file_path, 'rb') as f:
+                content = File(f)
+                content.DEFAULT_CHUNK_SIZE = BLOB_WRITE_CHUNK_SIZE
+                blob.file.save(file_hash, content, save=False)
+            return blob
+        except Exception as e:
+            logger.error(f"Error storing blob {file_hash[:16]}...: {e}")
+            return None
+
+    from concurrent.futures import ThreadPoolExecutor
+    from .restore_utils import COPY_MAX_WORKERS
+
+    workers = min(COPY_MAX_WORKERS, len(missing))
+    if workers < 2:
+        stored = [_store(file_hash) for file_hash in missing]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            stored = list(executor.map(_store, missing))
+    new_blobs = [blob for blob in stored if blob is not None]
+
+    FileBlob.objects.bulk_create(new_blobs, ignore_conflicts=True)
+
+    # ignore_conflicts leaves IDs unset, and a concurrent push may have
+    # inserted the same hash first - its row wins and our file is dropped
+    rows = FileBlob.objects.only('id', 'hash', 'file').in_bulk(
+        [blob.hash for blob in new_blobs], field_name='hash'
+    )
+    for blob in new_blobs:
+        row = rows.get(blob.hash)
+        if row is None:
             continue
+        if row.file.name != blob.file.name:
+            blob.file.storage.delete(blob.file.name)
+        blobs[blob.hash] = row
+    return blobs
+
+
+def write_inline_pack(pack_path, inline_entries):
+    """
+    Concatenate inline files into the version's pack file and record each
+    entry's storage='inline' and offset; the entry's size is its length
+    """
+    os.makedirs(os.path.dirname(pack_path), exist_ok=True)
+    offset = 0
+    with open(pack_path, 'wb') as pack:
+        for manifest_entry, file_path in inline_entries:
+            with open(file_path, 'rb', buffering=0) as f:
+                data = f.read(manifest_entry['size'])
+            pack.write(data)
+            manifest_entry.update(storage='inline', offset=offset)
+            offset += len(data)
+    return offset
+
+
+def stat_manifest_files(file_list, master_dir):
+    """
+    Stat the pushed files in the master for a manifest
+    Files missing from the master are skipped
 
+    Returns:
+        list of ({'path', 'hash', 'size'} entry, absolute path)
+    """
+    entries = []
+    for file_entry in file_list:
+        rel_path = file_entry['relative_path']
         file_path = os.path.join(master_dir, rel_path)
-        if not os.path.exists(file_path):
+        try:
+            file_size = os.stat(file_path).st_size
+        except FileNotFoundError:
             logger.warning(f"File not found: {file_path}")
             continue
 
-        file_size = os.path.getsize(file_path)
-        total_size += file_size
-
-        manifest_entry = {
+        entries.append(({
             'path': rel_path,
-            'hash': file_hash,
+            'hash': file_entry.get('hash'),
             'size': file_size
-        }
+        }, file_path))
+    return entries
 
-        if file_size > CAS_SIZE_THRESHOLD:
-            try:
-                blob = get_or_create_blob(file_path, file_hash)
-                blob.increment_ref()
-                manifest_entry['storage'] = 'cas'
-                manifest_entry['blob_id'] = blob.id
-                manifest_entry['blob_hash'] = blob.hash
-                cas_count += 1
-            except Exception as e:
-                logger.error(f"Error storing blob for {rel_path}: {e}")
-                with open(file_path, 'rb') as f:
-                    file_content = base64.b64encode(f.read()).decode('utf-8')
-                manifest_entry['storage'] = 'inline'
-                manifest_entry['content'] = file_content
-                inline_count += 1
+
+def create_cas_manifest(file_list, master_dir, version_dir, entries=None):
+    """
+    Create CAS manifest
+    Files above CAS_SIZE_THRESHOLD become FileBlobs; the rest are packed
+    raw into INLINE_PACK_FILENAME in version_dir, beside the manifest.
+    entries (from stat_manifest_files) saves re-stat'ing the master when
+    the caller already has them
+    """
+    from .models import INLINE_PACK_FILENAME
+
+    manifest = {
+        'files': [],
+        'created_at': timezone.now().isoformat(),
+        'cas_threshold_mb': CAS_SIZE_THRESHOLD / (1024 * 1024),
+        'hash_algorithm': FILE_HASH_ALGORITHM
+    }
+
+    if entries is None:
+        entries = stat_manifest_files(file_list, master_dir)
+
+    total_size = 0
+    cas_entries = []
+    inline_entries = []
+
+    for manifest_entry, file_path in entries:
+        total_size += manifest_entry['size']
+
+        if manifest_entry['size'] > CAS_SIZE_THRESHOLD and manifest_entry['hash']:
+            # Resolved below in one batch
+            cas_entries.append((manifest_entry, file_path))
         else:
-            with open(file_path, 'rb') as f:
-                file_content = base64.b64encode(f.read()).decode('utf-8')
-            manifest_entry['storage'] = 'inline'
-            manifest_entry['content'] = file_content
-            inline_count += 1
+            inline_entries.append((manifest_entry, file_path))
 
         manifest['files'].append(manifest_entry)
 
+    if cas_entries:
+        blobs = get_or_create_blobs({
+            entry['hash']: (file_path, entry['size']) for entry, file_path in cas_entries
+        })
+
+        ref_counts = Counter()
+        for manifest_entry, file_path in cas_entries:
+            blob = blobs.get(manifest_entry['hash'])
+            if blob is None:
+                logger.error(f"Error storing blob for {manifest_entry['path']}, inlining it")
+                inline_entries.append((manifest_entry, file_path))
+                continue
+            manifest_entry['storage'] = 'cas'
+            manifest_entry['blob_id'] = blob.id
+            manifest_entry['blob_hash'] = blob.hash
+            ref_counts[blob.id] += 1
+
+        # One reference per manifest entry, applied in a single UPDATE
+        FileBlob.objects.filter(id__in=ref_counts).update(
+            ref_count=F('ref_count') + ref_count_delta(ref_counts)
+        )
+
+    if inline_entries:
+        write_inline_pack(os.path.join(version_dir, INLINE_PACK_FILENAME), inline_entries)
+        manifest['inline_pack'] = INLINE_PACK_FILENAME
+
+    cas_count = sum(1 for entry in manifest['files'] if entry['storage'] == 'cas')
+    inline_count = len(manifest['files']) - cas_count
+
     logger.info(f"Manifest: {cas_count} CAS, {inline_count} inline, total={total_size}")
     return manifest, total_size, cas_count, inline_count
 
 
-def create_snapshot_zip(master_dir, version_obj):
-    """Create snapshot ZIP"""
+def create_snapshot_manifest(entries):
+    """
+    Manifest for a snapshot version: path/hash/size only, since the ZIP
+    carries the content (no inline encoding or CAS blobs)
+    """
+    return {
+        'files': [entry for entry, _ in entries],
+        'created_at': timezone.now().isoformat(),
+        'cas_threshold_mb': CAS_SIZE_THRESHOLD / (1024 * 1024),
+        'hash_algorithm': FILE_HASH_ALGORITHM
+    }
+
+
+def create_snapshot_zip(master_dir, version_obj, entries=None):
+    """
+    Create snapshot ZIP
+    entries (from stat_manifest_files) lists the members directly instead
+    of walking the master
+    """
     import tempfile
     
     temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip', prefix='snapshot_')
@@ -316,14 +808,19 @@ def create_snapshot_zip(master_dir, version_obj):
     
     logger.info(f"Creating snapshot: {temp_zip.name}")
     
-    total_files = 0
-    with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(master_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, master_dir)
-                zipf.write(file_path, arcname)
-                total_files += 1
+    from .restore_utils import iter_tree_files, write_zip_parallel
+
+    if entries is not None:
+        members = list({entry['path']: file_path for entry, file_path in entries}.items())
+    else:
+        members = list(iter_tree_files(master_dir))
+    
+    # Members are deflated on a thread pool at ZIP_COMPRESSLEVEL
+    errors = write_zip_parallel(temp_zip.name, members)
+    if errors:
+        os.remove(temp_zip.name)
+        raise RuntimeError(f"Snapshot ZIP failed: {'; '.join(errors[:5])}")
+    total_files = len(members)
     
     file_size = os.path.getsize(temp_zip.name)
     logger.info(f"Snapshot created: {total_files} files, {round(file_size / 1024 / 1024, 2)} MB")
@@ -331,9 +828,133 @@ def create_snapshot_zip(master_dir, version_obj):
     return temp_zip.name, file_size, total_files
 
 
-@shared_task(bind=True)
+def get_push_file_list(push, project):
+    """
+    Normalize a push's file list and drop entries matching the project's
+    ignore patterns
+
+    Returns:
+        (file_list, ignored_count)
+    """
+    # Entries without a relative path are dropped here rather than skipped
+    # by every later pass
+    file_list = []
+    for f in push.get_file_list() or []:
+        if isinstance(f, str):
+            try:
+                f = json.loads(f)
+            except Exception:
+                continue
+        if isinstance(f, dict) and f.get('relative_path'):
+            file_list.append(f)
+
+    ignored_count = 0
+    ignore_patterns = project.ignore_patterns or []
+    if ignore_patterns:
+        # Bound methods hoisted out of the per-file loop
+        is_ignored = ignore_matcher(ignore_patterns)
+        filtered_list = [f for f in file_list if not is_ignored(f['relative_path'])]
+        ignored_count = len(file_list) - len(filtered_list)
+        file_list = filtered_list
+
+    return file_list, ignored_count
+
+
+def _copy_push_file(job):
+    """
+    Copy one (rel_path, local_path, dest_path, expected_hash) job; returns the error or None
+    The copy is written beside the destination and renamed over it, so a
+    retried or interrupted copy never leaves a truncated master file
+    """
+    rel_path, local_path, dest_path, expected_hash = job
+    import tempfile
+    from .restore_utils import fast_copy_file
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f'.{os.path.basename(dest_path)}.', suffix='.part', dir=os.path.dirname(dest_path)
+        )
+        os.close(fd)
+        fast_copy_file(local_path, tmp_path, preserve_stat=True)
+        os.replace(tmp_path, dest_path)
+        return None
+    except Exception as e:
+        logger.error(f"Error copying {local_path}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return e
+
+
+def _fail_push(push_id, error):
+    """Mark a push (and its version) failed after an unexpected error"""
+    try:
+        # mark_failed also fails the linked version
+        push = PendingPush.objects.select_related('version').get(id=push_id)
+        push.mark_failed(error_message=str(error))
+    except Exception:
+        pass
+    logger.error(f"Error: {str(error)}", exc_info=True)
+    import traceback
+    traceback.print_exc()
+    return str(error)
+
+
+@shared_task(acks_late=True)
+def sync_push_files(push_id, jobs):
+    """
+    Chord header task: bring one batch of a push's files up to date in the master
+    Each job is [rel_path, local_path, dest_path, expected_hash, needs_hash];
+    master files without a cached hash are hashed here, and files whose
+    hash differs are copied. Copies are atomic renames, so a redelivered
+    batch (acks_late) simply redoes its work. Never raises: an unexpected
+    error comes back as the batch's error entry and finalize_push fails the
+    push (lost workers and time limits go to fail_chord_push instead).
+
+    Returns:
+        [copied, hashed, skipped, error]: [rel_path, dest_path, expected_hash] rows
+        for the files copied, [rel_path, dest_path, digest] rows for the master
+        files hashed, the number of files left as they were, and an error
+        message (None on success)
+    """
+    try:
+        return _sync_push_files(push_id, jobs) + [None]
+    except Exception as e:
+        logger.error("Sync batch of push %s failed: %s", push_id, e, exc_info=True)
+        return [[], [], 0, str(e) or type(e).__name__]
+
+
+def _sync_push_files(push_id, jobs):
+    """Body of sync_push_files: returns [copied, hashed, skipped]"""
+    if PendingPush.objects.filter(id=push_id, status='cancelled').exists():
+        return [[], [], 0]
+
+    digests = compute_file_hashes(
+        [dest_path for _, _, dest_path, _, needs_hash in jobs if needs_hash]
+    )
+    copied = []
+    skipped = 0
+    for rel_path, local_path, dest_path, expected_hash, needs_hash in jobs:
+        if needs_hash and digests.get(dest_path) == expected_hash:
+            skipped += 1
+        elif local_path and os.path.exists(local_path):
+            if _copy_push_file((rel_path, local_path, dest_path, expected_hash)) is None:
+                copied.append([rel_path, dest_path, expected_hash])
+    hashed = [
+        [rel_path, dest_path, digests[dest_path]]
+        for rel_path, _, dest_path, _, needs_hash in jobs
+        if needs_hash and dest_path in digests
+    ]
+    return [copied, hashed, skipped]
+
+
+@shared_task(bind=True, ignore_result=True)
 def process_pending_push_new(self, push_id):
-    """Process pending push with detailed change tracking and blob references"""
+    """
+    Process pending push with detailed change tracking and blob references
+    Large pushes hash and copy their files in a chord of sync_push_files
+    batches that ends in finalize_push; smaller ones do it here on local
+    thread pools
+    """
     try:
         push = PendingPush.objects.select_related('project', 'created_by', 'version').get(id=push_id)
         project = push.project
@@ -352,35 +973,11 @@ def process_pending_push_new(self, push_id):
             version_obj.status = 'processing'
             version_obj.save(update_fields=['status'])
 
-        # Normalize file list
-        file_list = push.file_list or []
-        normalized_file_list = []
-        for f in file_list:
-            if isinstance(f, str):
-                try:
-                    f = json.loads(f)
-                except Exception:
-                    continue
-            if isinstance(f, dict):
-                normalized_file_list.append(f)
-        file_list = normalized_file_list
-
-        # Apply ignore patterns
-        ignore_patterns = project.ignore_patterns or []
-        if ignore_patterns:
-            filtered_list = []
-            ignored_count = 0
-            for f in file_list:
-                rel_path = f.get('relative_path')
-                if rel_path and should_ignore_file(rel_path, ignore_patterns):
-                    ignored_count += 1
-                    continue
-                filtered_list.append(f)
-            file_list = filtered_list
-            if ignored_count > 0:
-                update_push_progress(push, 'processing', 5, f"Ignored {ignored_count} files")
+        file_list, ignored_count = get_push_file_list(push, project)
+        if ignored_count > 0:
+            update_push_progress(push, 'processing', 5, f"Ignored {ignored_count} files")
 
-        push.refresh_from_db()
+        push.refresh_from_db(fields=['status'])
         if push.status == 'cancelled' and version_obj:
             version_obj.delete()
             return "Push was cancelled"
@@ -395,232 +992,338 @@ def process_pending_push_new(self, push_id):
 
         # Copy files
         total_files = len(file_list) or 1
-        copied_count = 0
         skipped_count = 0
 
-        for idx, f in enumerate(file_list, start=1):
-            if idx % 10 == 0:
-                push.refresh_from_db()
+        # One pass over the entry dicts; the passes below work on
+        # (rel_path, dest_path, local_path, expected_hash) rows
+        rows = []
+        parent_dirs = set()
+        for f in file_list:
+            rel_path = f['relative_path']
+            dest_path = os.path.join(master_dir, rel_path)
+            rows.append((rel_path, dest_path, f.get('local_path'), f.get('hash')))
+            parent_dirs.add(os.path.dirname(dest_path))
+
+        # Create every parent directory once up front instead of per file
+        for parent_dir in sorted(parent_dirs, key=len):
+            os.makedirs(parent_dir, exist_ok=True)
+
+        # Master files whose cached hash already matches need no work; the
+        # rest are hashed (if the cache has nothing for them) and maybe copied
+        hash_cache = MasterHashCache(master_dir)
+        jobs = []
+        for rel_path, dest_path, local_path, expected_hash in rows:
+            if not expected_hash:
+                jobs.append((rel_path, local_path, dest_path, expected_hash, False))
+                continue
+            cached_hash = hash_cache.get(rel_path, dest_path)
+            if cached_hash is None:
+                jobs.append((rel_path, local_path, dest_path, expected_hash, True))
+            elif cached_hash == expected_hash:
+                skipped_count += 1
+            else:
+                jobs.append((rel_path, local_path, dest_path, expected_hash, False))
+
+        if len(jobs) >= PUSH_CHORD_MIN_FILES:
+            # Fan hashing and copying out across workers; finalize_push
+            # continues from the master sweep once every batch has reported back
+            batches = [
+                jobs[i:i + PUSH_CHORD_BATCH_SIZE]
+                for i in range(0, len(jobs), PUSH_CHORD_BATCH_SIZE)
+            ]
+            message = f"Syncing {len(jobs)} files in {len(batches)} tasks"
+            update_push_progress(push, 'processing', 20, message)
+            try:
+                from celery import chord
+                chord(sync_push_files.s(push_id, batch) for batch in batches)(
+                    finalize_push.s(push_id, skipped_count).on_error(fail_chord_push.s(push_id))
+                )
+                return message
+            except Exception as e:
+                logger.warning(f"Could not dispatch sync chord ({e}), continuing locally")
+
+        to_hash = {dest_path: rel_path for rel_path, _, dest_path, _, needs_hash in jobs if needs_hash}
+        existing_hashes = {}
+        for file_path, digest in compute_file_hashes(to_hash).items():
+            existing_hashes[file_path] = digest
+            hash_cache.set(to_hash[file_path], file_path, digest)
+
+        copy_jobs = []
+        for rel_path, local_path, dest_path, expected_hash, needs_hash in jobs:
+            if needs_hash and existing_hashes.get(dest_path) == expected_hash:
+                skipped_count += 1
+            elif local_path and os.path.exists(local_path):
+                copy_jobs.append((rel_path, local_path, dest_path, expected_hash))
+
+        # Files that need no copy count as processed straight away
+        processed = total_files - len(copy_jobs)
+        update_push_progress(push, 'processing', 15 + int((processed / total_files) * 40),
+                             f"Processed {processed}/{total_files} files")
+
+        # Copies run on COPY_MAX_WORKERS threads; counters, the hash cache and
+        # progress are only touched here as results come back
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from .restore_utils import COPY_MAX_WORKERS
+
+        copied = []
+        next_check = 0.0
+        workers = max(1, min(COPY_MAX_WORKERS, len(copy_jobs)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_copy_push_file, job): job for job in copy_jobs}
+            for done, future in enumerate(as_completed(futures), start=1):
+                rel_path, local_path, dest_path, expected_hash = futures[future]
+                if future.result() is None:
+                    copied.append([rel_path, dest_path, expected_hash])
+
+                # The cancel check and progress write cost a query each, so
+                # they run at most once per PUSH_PROGRESS_MIN_INTERVAL
+                if done != len(futures):
+                    if done % PUSH_PROGRESS_EVERY or time.monotonic() < next_check:
+                        continue
+                next_check = time.monotonic() + PUSH_PROGRESS_MIN_INTERVAL
+
+                push.refresh_from_db(fields=['status'])
                 if push.status == 'cancelled' and version_obj:
+                    executor.shutdown(cancel_futures=True)
                     version_obj.delete()
                     return "Push was cancelled"
 
-            local_path = f.get('local_path')
-            rel_path = f.get('relative_path')
-            expected_hash = f.get('hash')
+                processed = total_files - len(copy_jobs) + done
+                progress_pct = 15 + int((processed / total_files) * 40)
+                update_push_progress(push, 'processing', progress_pct, f"Processed {processed}/{total_files} files",
+                                     throttle=done != len(futures))
 
-            if not rel_path:
-                continue
+        return _finalize_push(
+            push, project, version_obj, creator, file_list, master_dir, hash_cache, [copied], skipped_count
+        )
 
-            dest_path = os.path.join(master_dir, rel_path)
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    except PendingPush.DoesNotExist:
+        return "PendingPush not found"
+    except Exception as e:
+        return _fail_push(push_id, e)
 
-            use_existing = False
-            if os.path.exists(dest_path):
-                try:
-                    current_hash = compute_file_hash(dest_path)
-                    if expected_hash and current_hash == expected_hash:
-                        use_existing = True
-                        skipped_count += 1
-                except Exception:
-                    pass
-
-            if not use_existing and local_path and os.path.exists(local_path):
-                try:
-                    shutil.copy2(local_path, dest_path)
-                    copied_count += 1
-                except Exception as e:
-                    logger.error(f"Error copying {local_path}: {e}")
 
-            progress_pct = 15 + int((idx / total_files) * 40)
-            update_push_progress(push, 'processing', progress_pct, f"Processed {idx}/{total_files} files")
+@shared_task(bind=True)
+def finalize_push(self, copy_results, push_id, skipped_count):
+    """
+    Chord body of a fanned-out push: record the hashes and copies, then
+    sweep the master and build the version
 
-        # Remove deleted files
-        push.refresh_from_db()
-        if push.status == 'cancelled' and version_obj:
-            version_obj.delete()
-            return "Push was cancelled"
+    Args:
+        copy_results: one [copied, hashed, skipped, error] result per sync_push_files batch
+        push_id: PendingPush ID
+        skipped_count: Files whose cached hash already matched
+    """
+    errors = [error for _, _, _, error in copy_results if error]
+    if errors:
+        return _fail_push(push_id, f"File sync failed: {errors[0]}")
 
-        incoming_set = set([f.get('relative_path') for f in file_list if f.get('relative_path')])
-        removed_count = 0
-        for root, dirs, files in os.walk(master_dir):
-            for fname in files:
-                full_path = os.path.join(root, fname)
-                rel = os.path.relpath(full_path, master_dir).replace('\\', '/')
-                if rel not in incoming_set:
-                    try:
-                        os.remove(full_path)
-                        removed_count += 1
-                    except Exception as e:
-                        logger.error(f"Error removing {full_path}: {e}")
-
-        # Cleanup empty directories
-        for root, dirs, files in os.walk(master_dir, topdown=False):
-            for dir_name in dirs:
-                dir_path = os.path.join(root, dir_name)
-                try:
-                    if not os.listdir(dir_path):
-                        os.rmdir(dir_path)
-                except Exception:
-                    pass
+    try:
+        push = PendingPush.objects.select_related('project', 'created_by', 'version').get(id=push_id)
+        project = push.project
+        file_list, _ = get_push_file_list(push, project)
+        master_dir = get_project_master_path_inline(project)
+        hash_cache = MasterHashCache(master_dir)
+        for _, hashed, skipped, _ in copy_results:
+            skipped_count += skipped
+            for rel_path, dest_path, digest in hashed:
+                hash_cache.set(rel_path, dest_path, digest)
+        return _finalize_push(
+            push, project, push.version, push.created_by, file_list, master_dir,
+            hash_cache, [copied for copied, _, _, _ in copy_results], skipped_count
+        )
+    except PendingPush.DoesNotExist:
+        return "PendingPush not found"
+    except Exception as e:
+        return _fail_push(push_id, e)
 
-        update_push_progress(push, 'processing', 60, f"Master updated: {copied_count} copied, {skipped_count} unchanged, {removed_count} removed")
 
-        push.refresh_from_db()
-        if push.status == 'cancelled' and version_obj:
-            version_obj.delete()
-            return "Push was cancelled"
+@shared_task
+def fail_chord_push(request, exc, traceback, push_id):
+    """
+    Chord errback of a fanned-out push: a sync_push_files batch raised
+    anyway (lost worker, time limit...) so finalize_push will never run -
+    fail the push and its version instead of leaving them processing
+    """
+    return _fail_push(push_id, exc)
 
-        # Get previous version
-        previous_version = Version.objects.filter(
-            project=project,
-            status='completed'
-        ).exclude(uid=version_obj.uid if version_obj else None).order_by('-created_at').first()
-
-        # Determine version number
-        completed_versions = Version.objects.filter(
-            project=project,
-            status='completed'
-        ).exclude(uid=version_obj.uid if version_obj else None)
-        new_version_number = completed_versions.count() + 1
-        is_snapshot = should_create_snapshot(new_version_number)
-
-        update_push_progress(push, 'processing', 65, f"Creating v{new_version_number} - {'Snapshot' if is_snapshot else 'CAS'}")
-
-        # Create manifest
-        update_push_progress(push, 'processing', 70, "Creating manifest...")
-        manifest, total_size, cas_count, inline_count = create_cas_manifest(file_list, master_dir)
-        manifest_hash = compute_manifest_hash(manifest)
-
-        # Check for duplicate
-        existing_version = Version.objects.filter(
-            project=project,
-            hash=manifest_hash,
-            status='completed'
-        ).exclude(uid=version_obj.uid if version_obj else None).first()
-        
-        if existing_version:
-            logger.info(f"Duplicate detected! Mapping to v{existing_version.version_number}")
-            previous_placeholder = version_obj
-            push.version = existing_version
-            push.mark_completed()
-            update_push_progress(push, 'done', 100, f"Mapped to existing v{existing_version.version_number}")
-            if previous_placeholder and previous_placeholder.uid != existing_version.uid:
-                try:
-                    previous_placeholder.delete()
-                except Exception as e:
-                    logger.error(f"Error deleting placeholder: {e}")
-            return f"Mapped to v{existing_version.version_number}"
-
-        # Calculate detailed changes
-        files_added, files_modified, files_deleted, size_change, change_details = compare_with_previous_version(manifest, previous_version)
-
-        # Update version
-        version_obj.is_snapshot = is_snapshot
-        version_obj.hash = manifest_hash
-        version_obj.file_count = len(file_list)
-        version_obj.file_size = total_size
-        version_obj.created_at = timezone.now()
-        version_obj.created_by = creator
-        version_obj.previous_version = previous_version
-        version_obj.files_added = files_added
-        version_obj.files_modified = files_modified
-        version_obj.files_deleted = files_deleted
-        version_obj.size_change = size_change
-        version_obj.change_details = change_details
-        version_obj.version_number = new_version_number
 
-        if is_snapshot:
-            update_push_progress(push, 'processing', 75, f"Creating snapshot for v{new_version_number}...")
-            
+def _finalize_push(push, project, version_obj, creator, file_list, master_dir, hash_cache,
+                   copy_results, skipped_count):
+    """
+    Second half of a push, after the master copies: remove files no longer
+    pushed, build the manifest/snapshot and complete the version
+    """
+    copied_count = 0
+    for batch in copy_results:
+        for rel_path, dest_path, expected_hash in batch:
+            copied_count += 1
+            if expected_hash:
+                hash_cache.set(rel_path, dest_path, expected_hash)
+
+    # Remove deleted files
+    push.refresh_from_db(fields=['status'])
+    if push.status == 'cancelled' and version_obj:
+        version_obj.delete()
+        return "Push was cancelled"
+
+    incoming_set = frozenset(f['relative_path'] for f in file_list)
+    removed_count = prune_master_dir(master_dir, incoming_set)
+
+    hash_cache.retain(incoming_set)
+    hash_cache.save()
+
+    update_push_progress(push, 'processing', 60, f"Master updated: {copied_count} copied, {skipped_count} unchanged, {removed_count} removed")
+
+    push.refresh_from_db(fields=['status'])
+    if push.status == 'cancelled' and version_obj:
+        version_obj.delete()
+        return "Push was cancelled"
+
+    # The highest-numbered completed version is the previous one; numbers
+    # follow it so a deleted version's number is never reused
+    previous_version = Version.objects.filter(
+        project=project,
+        status='completed',
+        version_number__isnull=False
+    ).exclude(uid=version_obj.uid if version_obj else None).order_by('-version_number').first()
+
+    # Determine version number
+    new_version_number = (previous_version.version_number if previous_version else 0) + 1
+    is_snapshot = should_create_snapshot(new_version_number)
+
+    update_push_progress(push, 'processing', 65, f"Creating v{new_version_number} - {'Snapshot' if is_snapshot else 'CAS'}")
+
+    # The duplicate hash only covers path/hash/size, so check it before
+    # encoding inline files or storing blobs
+    manifest_entries = stat_manifest_files(file_list, master_dir)
+    manifest_hash = compute_manifest_hash({'files': [entry for entry, _ in manifest_entries]})
+
+    # Check for duplicate
+    existing_version = Version.objects.filter(
+        project=project,
+        hash=manifest_hash,
+        status='completed'
+    ).exclude(uid=version_obj.uid if version_obj else None).first()
+    
+    if existing_version:
+        logger.info(f"Duplicate detected! Mapping to v{existing_version.version_number}")
+        previous_placeholder = version_obj
+        push.version = existing_version
+        push.mark_completed(f"Mapped to existing v{existing_version.version_number}")
+        if previous_placeholder and previous_placeholder.uid != existing_version.uid:
+            try:
+                previous_placeholder.delete()
+            except Exception as e:
+                logger.error(f"Error deleting placeholder: {e}")
+        return f"Mapped to v{existing_version.version_number}"
+
+    # Create manifest
+    update_push_progress(push, 'processing', 70, "Creating manifest...")
+    if is_snapshot:
+        # The ZIP holds the content and the manifest is never saved, so
+        # only the entries needed for the change summary are built
+        manifest = create_snapshot_manifest(manifest_entries)
+        total_size = sum(entry['size'] for entry in manifest['files'])
+        cas_count = inline_count = 0
+    else:
+        # The inline pack lands in the vN directory the manifest is saved to
+        version_obj.version_number = new_version_number
+        manifest, total_size, cas_count, inline_count = create_cas_manifest(
+            file_list, master_dir, version_obj.get_version_directory(), manifest_entries
+        )
+
+    # Calculate detailed changes
+    files_added, files_modified, files_deleted, size_change, change_details = compare_with_previous_version(manifest, previous_version)
+
+    # Update version
+    version_obj.is_snapshot = is_snapshot
+    version_obj.hash = manifest_hash
+    version_obj.file_count = len(file_list)
+    version_obj.file_size = total_size
+    version_obj.created_at = timezone.now()
+    version_obj.created_by = creator
+    version_obj.previous_version = previous_version
+    version_obj.files_added = files_added
+    version_obj.files_modified = files_modified
+    version_obj.files_deleted = files_deleted
+    version_obj.size_change = size_change
+    version_obj.change_details = change_details
+    version_obj.version_number = new_version_number
+    version_obj.manifest_file_count = len(manifest['files'])
+    version_obj.manifest_total_size = total_size
+    version_obj.manifest_cas_count = cas_count
+    version_obj.manifest_inline_count = inline_count
+    version_obj.manifest_cas_threshold_mb = manifest['cas_threshold_mb']
+
+    # File I/O happens first, outside the transaction, so no locks are
+    # held while the ZIP is built or the manifest written
+    if is_snapshot:
+        update_push_progress(push, 'processing', 75, f"Creating snapshot for v{new_version_number}...")
+        
+        try:
+            temp_zip_path, zip_size, zip_file_count = create_snapshot_zip(
+                master_dir, version_obj, manifest_entries
+            )
             try:
-                temp_zip_path, zip_size, zip_file_count = create_snapshot_zip(master_dir, version_obj)
-                
                 with open(temp_zip_path, 'rb') as f:
                     version_obj.file.save(f'snapshot.zip', File(f), save=False)
-                
-                version_obj.file_size = zip_size
-                version_obj.manifest_file_path = None
-                version_obj.save()
-                
+            finally:
                 os.remove(temp_zip_path)
-                
-                update_push_progress(push, 'processing', 90, f"Snapshot v{new_version_number} created")
-                
-            except Exception as e:
-                logger.error(f"Snapshot creation failed: {e}")
-                raise
-        else:
-            update_push_progress(push, 'processing', 80, "Saving CAS manifest...")
-            version_obj.file = None
-            version_obj.save()
-            version_obj.save_manifest_to_file(manifest)
             
-            # Create blob references
-            username = project.owner.username if project.owner else 'Unknown'
-            user_id = project.owner.id if project.owner else 'N/A'
-            project_name = project.name
-            project_uid = project.uid[:8]
+            version_obj.file_size = zip_size
+            version_obj.manifest_file_path = None
             
-            with transaction.atomic():
-                for file_entry in manifest.get('files', []):
-                    if file_entry.get('storage') == 'cas':
-                        blob_id = file_entry.get('blob_id')
-                        if blob_id:
-                            try:
-                                blob = FileBlob.objects.get(id=blob_id)
-                                BlobReference.objects.get_or_create(
-                                    blob=blob,
-                                    project=project,
-                                    version=version_obj
-                                )
-                                print(f"[BLOB] Created reference: blob {blob.hash[:16]}... -> {username}_{user_id}:{project_name}_{project_uid} v{new_version_number}")
-                            except FileBlob.DoesNotExist:
-                                logger.warning(f"Blob {blob_id} not found when creating reference")
-                            except Exception as e:
-                                logger.error(f"Error creating blob reference: {e}")
+            update_push_progress(push, 'processing', 90, f"Snapshot v{new_version_number} created")
+            
+        except Exception as e:
+            logger.error(f"Snapshot creation failed: {e}")
+            raise
+    else:
+        update_push_progress(push, 'processing', 80, "Saving CAS manifest...")
+        version_obj.file = None
+        version_obj.save_manifest_to_file(manifest, save=False)
+
+    # Version row, blob references and completion commit together
+    with transaction.atomic():
+        version_obj.save()
+
+        if not is_snapshot:
+            blob_ids = {
+                file_entry['blob_id'] for file_entry in manifest.get('files', [])
+                if file_entry.get('storage') == 'cas' and file_entry.get('blob_id')
+            }
+            BlobReference.objects.bulk_create(
+                [BlobReference(blob_id=blob_id, project=project, version=version_obj) for blob_id in blob_ids],
+                ignore_conflicts=True
+            )
+            logger.info(
+                "Created %d blob references for project %s v%s",
+                len(blob_ids), project.uid, new_version_number
+            )
 
         # Mark completed
         version_obj.mark_completed()
 
-        total_size_mb = round((version_obj.file_size or total_size) / (1024 * 1024), 2)
-        storage_label = 'Snapshot' if is_snapshot else 'CAS'
+    total_size_mb = round((version_obj.file_size or total_size) / (1024 * 1024), 2)
+    storage_label = 'Snapshot' if is_snapshot else 'CAS'
 
-        # Build message with changes
-        change_msg = f"+{files_added}" if files_added > 0 else ""
-        if files_modified > 0:
-            change_msg += f", ~{files_modified}" if change_msg else f"~{files_modified}"
-        if files_deleted > 0:
-            change_msg += f", -{files_deleted}" if change_msg else f"-{files_deleted}"
-        
-        if not change_msg:
-            change_msg = "no changes"
-
-        if is_snapshot:
-            message = f"{storage_label} v{new_version_number} created ({total_size_mb} MB, {change_msg})"
-        else:
-            message = f"{storage_label} v{new_version_number} created ({total_size_mb} MB, {cas_count} CAS, {inline_count} inline, {change_msg})"
+    # Build message with changes
+    change_msg = f"+{files_added}" if files_added > 0 else ""
+    if files_modified > 0:
+        change_msg += f", ~{files_modified}" if change_msg else f"~{files_modified}"
+    if files_deleted > 0:
+        change_msg += f", -{files_deleted}" if change_msg else f"-{files_deleted}"
+    
+    if not change_msg:
+        change_msg = "no changes"
 
-        update_push_progress(push, 'done', 100, message)
-        push.mark_completed()
+    if is_snapshot:
+        message = f"{storage_label} v{new_version_number} created ({total_size_mb} MB, {change_msg})"
+    else:
+        message = f"{storage_label} v{new_version_number} created ({total_size_mb} MB, {cas_count} CAS, {inline_count} inline, {change_msg})"
 
-        logger.info(f"✓ Version v{new_version_number} completed")
-        return f"Version v{new_version_number} created"
+    push.mark_completed(message)
 
-    except PendingPush.DoesNotExist:
-        return "PendingPush not found"
-    except Exception as e:
-        try:
-            push = PendingPush.objects.get(id=push_id)
-            push.mark_failed(error_message=str(e))
-            if push.version:
-                try:
-                    push.version.mark_failed()
-                except Exception:
-                    pass
-        except Exception:
-            pass
-        logger.error(f"Error: {str(e)}", exc_info=True)
-        import traceback
-        traceback.print_exc()
-        return str(e)
\ No newline at end of file
+    logger.info(f"✓ Version v{new_version_number} completed")
+    return f"Version v{new_version_number} created"
@@ -4,53 +4,227 @@ FIXED: UID support, secure 404 responses, and project ID usage
 """
 
 import os
+import math
+import time
+import zlib
+from collections import Counter
+from urllib.parse import quote
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from asgiref.sync import sync_to_async
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from django.http import FileResponse, Http404
-
+from django.db import transaction
+from django.db.models import Value
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, quote_etag
+
+from Dawlogs_backend.renderers import JsonLinesRenderer
 from projects.models import Project
-from .models import Version, PendingPush, DownloadRequest
+from .models import (
+    Version,
+    PendingPush,
+    DownloadRequest,
+    FILE_LIST_CACHE_SECONDS,
+    recent_download_cache_key
+)
 from .serializers import (
     VersionSerializer,
-    VersionListSerializer,
     PendingPushSerializer,
     VersionUploadSerializer,
-    DownloadRequestSerializer
+    DownloadRequestSerializer,
+    download_status_values,
+    instance_from_values,
+    version_list_rows
 )
-from .tasks import process_pending_push_new
+from .tasks import process_pending_push_new, ignore_matcher
 from .download_tasks import create_download_zip
 from .restore_utils import get_version_file_list
-import fnmatch
-
-
-def sanitize_string(s):
-    """Remove null characters"""
-    if not isinstance(s, str):
-        return s
-    return ''.join(char for char in s if ord(char) >= 32 or char in '\n\r\t')
-
-
-def sanitize_dict(data):
-    """Recursively sanitize strings"""
-    if isinstance(data, dict):
-        return {k: sanitize_dict(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_dict(item) for item in data]
-    elif isinstance(data, str):
-        return sanitize_string(data)
+from Dawlogs_backend.sanitize import sanitize_string, sanitize_dict_in_place
+
+
+# Internal nginx location serving MEDIA_ROOT (None streams ZIPs from Python)
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = getattr(settings, 'DOWNLOAD_ACCEL_REDIRECT_PREFIX', None)
+# Apache/lighttpd equivalent: X-Sendfile with the absolute path
+DOWNLOAD_X_SENDFILE = getattr(settings, 'DOWNLOAD_X_SENDFILE', False)
+# Read size for ZIPs streamed from Python (FileResponse default is 8 KiB)
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+# Status endpoints accept ?wait=<seconds> (long polling): the request is held
+# until the status/progress changes, re-reading just those two columns
+# Each held poll occupies a sync worker thread (time.sleep between reads),
+# so the cap stays short; size the worker pool for the expected pollers
+STATUS_LONG_POLL_MAX_SECONDS = getattr(settings, 'STATUS_LONG_POLL_MAX_SECONDS', 10)
+STATUS_LONG_POLL_INTERVAL = 0.5
+
+
+def check_etag(request, *parts):
+    """
+    Strong ETag from the given parts
+    Returns (etag, 304 response or None) - a matching If-None-Match skips
+    the listing's query and serialization entirely
+    """
+    etag = quote_etag('-'.join(str(part) for part in parts))
+    return etag, get_conditional_response(request, etag=etag)
+
+
+def check_status_etag(request, uid, status, progress, *details):
+    """
+    Weak ETag for a status poll: uid, status, progress and a CRC of the
+    detail texts (message, error...). Clock-derived fields such as the
+    duration or time remaining are left out, so a poll whose task has not
+    advanced gets a 304 without building the response
+    Returns (etag, 304 response or None)
+    """
+    digest = zlib.crc32('\x1f'.join(str(detail) for detail in details).encode('utf-8'))
+    etag = 'W/' + quote_etag(f'{uid}-{status}-{progress}-{digest:08x}')
+    return etag, get_conditional_response(request, etag=etag)
+
+
+def get_long_poll_timeout(request):
+    """Seconds a status request may be held (?wait=, capped), 0 for none"""
+    try:
+        wait = float(request.query_params.get('wait', 0))
+    except ValueError:
+        return 0
+    if not math.isfinite(wait):
+        # nan would never reach the deadline (inf is capped, but rejected alike)
+        return 0
+    return min(max(wait, 0), STATUS_LONG_POLL_MAX_SECONDS)
+
+
+def wait_for_status_change(queryset, status, progress, timeout):
+    """
+    Hold a long-poll request until the row's (status, progress) differs from
+    the given values, the row is gone, or timeout seconds pass
+    Returns True if something changed
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(STATUS_LONG_POLL_INTERVAL, remaining))
+        current = queryset.values_list('status', 'progress').first()
+        if current != (status, progress):
+            return True
+
+
+def _iter_file_range(file_obj, start, length):
+    """Yield length bytes of file_obj from start, DOWNLOAD_BLOCK_SIZE at a time"""
+    with file_obj:
+        file_obj.seek(start)
+        while length > 0:
+            chunk = file_obj.read(min(DOWNLOAD_BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def _aiter_file_range(file_obj, start, length):
+    """
+    Async counterpart of _iter_file_range for ASGI servers: reads run in a
+    worker thread, so the event loop keeps serving other requests
+    """
+    read = sync_to_async(file_obj.read, thread_sensitive=False)
+    try:
+        await sync_to_async(file_obj.seek, thread_sensitive=False)(start)
+        while length > 0:
+            chunk = await read(min(DOWNLOAD_BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file_obj.close()
+
+
+def parse_byte_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, end inclusive
+    None if the header is not a byte range at all (serve the whole file);
+    raises ValueError for multipart or unsatisfiable ranges (416)
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+    if ',' in spec:
+        raise ValueError('Multiple ranges are not supported')
+    
+    first, _, last = spec.strip().partition('-')
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
     else:
-        return data
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix <= 0:
+            raise ValueError('Empty suffix range')
+        start = max(size - suffix, 0)
+        end = size - 1
+    
+    end = min(end, size - 1)
+    if start < 0 or start > end:
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+def ranged_file_response(request, path, filename, size=None):
+    """
+    Serve a file as an attachment, honouring a single Range header (206) so
+    interrupted downloads resume instead of restarting
+    size may be passed in when already known (skips the stat)
+    """
+    if size is None:
+        size = os.path.getsize(path)
+    range_header = request.META.get('HTTP_RANGE')
+    byte_range = None
+    if range_header and size:
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    
+    # Under ASGI Django buffers a synchronous iterator completely (list())
+    # before sending it, so the body has to be an async iterator there
+    is_asgi = isinstance(getattr(request, '_request', request), ASGIRequest)
+    
+    if byte_range is None and not is_asgi:
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+        # Block size handed to the server's wsgi.file_wrapper
+        response.block_size = DOWNLOAD_BLOCK_SIZE
+    else:
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1
+        iter_range = _aiter_file_range if is_asgi else _iter_file_range
+        response = StreamingHttpResponse(
+            iter_range(open(path, 'rb'), start, length),
+            status=status.HTTP_200_OK if byte_range is None else status.HTTP_206_PARTIAL_CONTENT,
+            content_type='application/zip'
+        )
+        response['Content-Length'] = length
+        if byte_range is not None:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    
+    response['Accept-Ranges'] = 'bytes'
+    return response
 
 
 def get_project_or_404(uid_or_id, user):
     """Get project by UID or return 404 (not permission denied)"""
     try:
-        project = Project.objects.get(uid=uid_or_id)
+        project = Project.objects.select_related('owner').get(uid=uid_or_id)
     except Project.DoesNotExist:
         raise Http404("Project not found")
     
@@ -61,10 +235,23 @@ def get_project_or_404(uid_or_id, user):
     return project
 
 
+def find_user_project_by_name(user, name):
+    """
+    Project called name that user owns or is a member of (owned first)
+    Two indexed lookups in one UNION ALL instead of an OR across the
+    members join, which could also match more than one project
+    """
+    owned = Project.objects.filter(owner=user, name=name).annotate(owned=Value(1)).order_by()
+    shared = Project.objects.filter(members_new__user=user, name=name).annotate(owned=Value(0)).order_by()
+    return owned.union(shared, all=True).order_by('-owned').first()
+
+
 def get_version_or_404(uid_or_id, user):
     """Get version by UID or return 404"""
     try:
-        version = Version.objects.get(uid=uid_or_id)
+        version = Version.objects.select_related(
+            'project', 'project__owner', 'created_by', 'previous_version'
+        ).get(uid=uid_or_id)
     except Version.DoesNotExist:
         raise Http404("Version not found")
     
@@ -77,7 +264,9 @@ def get_version_or_404(uid_or_id, user):
 def get_download_or_404(uid_or_id, user):
     """Get download request by UID or return 404"""
     try:
-        download = DownloadRequest.objects.get(uid=uid_or_id)
+        download = DownloadRequestSerializer.setup_eager_loading(
+            DownloadRequest.objects
+        ).get(uid=uid_or_id)
     except DownloadRequest.DoesNotExist:
         raise Http404("Download not found")
     
@@ -87,10 +276,19 @@ def get_download_or_404(uid_or_id, user):
     return download
 
 
-def get_push_or_404(uid_or_id, user):
-    """Get push by UID or return 404"""
+def get_push_or_404(uid_or_id, user, with_file_list=True):
+    """
+    Get push by UID or return 404
+    The version's change_details JSON is never read through a push; the
+    approve/reject/cancel actions also leave the push's file_list unloaded
+    """
+    pushes = PendingPush.objects.select_related(
+        'project', 'project__owner', 'created_by', 'approved_by', 'version'
+    ).defer('version__change_details')
+    if not with_file_list:
+        pushes = pushes.defer('file_list')
     try:
-        push = PendingPush.objects.get(uid=uid_or_id)
+        push = pushes.get(uid=uid_or_id)
     except PendingPush.DoesNotExist:
         raise Http404("Push not found")
     
@@ -105,9 +303,16 @@ def get_push_or_404(uid_or_id, user):
 # ============================================================================
 
 class ProjectVersionsView(APIView):
-    """Get all versions for a project"""
+    """
+    Get all versions for a project
+    Clients asking for application/x-ndjson (or ?format=jsonl) get the
+    version rows streamed one per line instead of one JSON document
+    """
  
     permission_classes = [IsAuthenticated]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [JsonLinesRenderer]
+    
+    STREAM_CHUNK_SIZE = 200
     
     def get(self, request, project_uid):
         """List all versions"""
@@ -115,6 +320,18 @@ class ProjectVersionsView(APIView):
         
         include_processing = request.query_params.get('include_processing', 'false').lower() == 'true'
         
+        # Any version save/delete restamps versions_changed_at; updated_at
+        # covers the project name in the payload
+        changed_at = project.versions_changed_at
+        etag, not_modified = check_etag(
+            request, project.uid,
+            changed_at.timestamp() if changed_at else 0,
+            project.updated_at.timestamp(),
+            int(include_processing), request.accepted_renderer.format
+        )
+        if not_modified is not None:
+            return not_modified
+        
         if include_processing:
             versions = project.versions_new.all().order_by('-created_at')
         else:
@@ -122,21 +339,35 @@ class ProjectVersionsView(APIView):
                 status__in=['completed', 'processing']
             ).order_by('-created_at')
         
-        serializer = VersionListSerializer(
-            versions,
-            many=True,
-            context={'request': request}
-        )
+        if request.accepted_renderer.format == JsonLinesRenderer.format:
+            response = StreamingHttpResponse(
+                self.stream_versions(request, versions),
+                content_type=JsonLinesRenderer.media_type
+            )
+            response['ETag'] = etag
+            return response
+        
+        # Rows are built from values_list() tuples (no Version instances), and
+        # both listings include every completed and processing version, so the
+        # counts come from the fetched rows instead of COUNT queries
+        rows = list(version_list_rows(versions))
+        status_counts = Counter(row['status'] for row in rows)
         
-        return Response(sanitize_dict({
+        return Response(sanitize_dict_in_place({
             'project_uid': project.uid,
             'project_name': project.name,
             'project_id': project.id,
-            'version_count': versions.count(),
-            'completed_count': project.versions_new.filter(status='completed').count(),
-            'processing_count': project.versions_new.filter(status='processing').count(),
-            'versions': serializer.data
-        }))
+            'version_count': len(rows),
+            'completed_count': status_counts['completed'],
+            'processing_count': status_counts['processing'],
+            'versions': rows
+        }), headers={'ETag': etag})
+    
+    def stream_versions(self, request, versions):
+        """Yield one JSON line per version, reading rows in chunks"""
+        renderer = request.accepted_renderer
+        for row in version_list_rows(versions, chunk_size=self.STREAM_CHUNK_SIZE):
+            yield renderer.render_line(sanitize_dict_in_place(row))
 
 
 class VersionDetailView(APIView):
@@ -149,7 +380,7 @@ class VersionDetailView(APIView):
         version = get_version_or_404(version_uid, request.user)
         
         serializer = VersionSerializer(version, context={'request': request})
-        return Response(sanitize_dict(serializer.data))
+        return Response(sanitize_dict_in_place(serializer.data))
     
     def delete(self, request, version_uid):
         """Delete a version"""
@@ -190,68 +421,59 @@ class VersionUploadView(APIView):
         
         project_name = sanitize_string(serializer.validated_data['project_name'])
         commit_message = sanitize_string(serializer.validated_data['commit_message'])
-        file_list = sanitize_dict(serializer.validated_data['file_list'])
-        
-        # Get or create project
-        try:
-            project = Project.objects.get(
-                Q(owner=request.user) | Q(members_new__user=request.user),
-                name=project_name
-            )
-        except Project.DoesNotExist:
-            project = Project.objects.create(
-                owner=request.user,
-                name=project_name
+        file_list = sanitize_dict_in_place(serializer.validated_data['file_list'])
+        
+        # The project (if new), version placeholder and push commit together:
+        # one transaction instead of one per INSERT, and no orphan rows if a
+        # later insert fails
+        with transaction.atomic():
+            # Get or create project
+            project = find_user_project_by_name(request.user, project_name)
+            if project is None:
+                project = Project.objects.create(
+                    owner=request.user,
+                    name=project_name
+                )
+        
+            if not project.user_can_edit(request.user):
+                return Response(
+                    {'error': 'You do not have permission to push to this project'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+            # Filter by ignore patterns
+            if project.ignore_patterns:
+                is_ignored = ignore_matcher(project.ignore_patterns)
+                file_list = [
+                    file_entry for file_entry in file_list
+                    if not is_ignored(file_entry.get('relative_path', ''))
+                ]
+        
+            # Create version placeholder
+            version = Version.objects.create(
+                project=project,
+                commit_message=commit_message,
+                created_by=request.user,
+                status='pending'
             )
         
-        if not project.user_can_edit(request.user):
-            return Response(
-                {'error': 'You do not have permission to push to this project'},
-                status=status.HTTP_403_FORBIDDEN
+            # Determine status
+            initial_status = 'pending'
+            if project.require_push_approval and request.user != project.owner:
+                initial_status = 'awaiting_approval'
+        
+            # Create push
+            pending_push = PendingPush.objects.create(
+                project=project,
+                created_by=request.user,
+                commit_message=commit_message,
+                file_list=file_list,
+                version=version,
+                status=initial_status,
+                progress=0,
+                message='Push request received' if initial_status == 'pending' else 'Awaiting approval'
             )
         
-        # Filter by ignore patterns
-        if project.ignore_patterns:
-            filtered_file_list = []
-            for file_entry in file_list:
-                rel_path = file_entry.get('relative_path', '')
-                should_ignore = False
-                
-                for pattern in project.ignore_patterns:
-                    if fnmatch.fnmatch(rel_path, pattern):
-                        should_ignore = True
-                        break
-                
-                if not should_ignore:
-                    filtered_file_list.append(file_entry)
-            
-            file_list = filtered_file_list
-        
-        # Create version placeholder
-        version = Version.objects.create(
-            project=project,
-            commit_message=commit_message,
-            created_by=request.user,
-            status='pending'
-        )
-        
-        # Determine status
-        initial_status = 'pending'
-        if project.require_push_approval and request.user != project.owner:
-            initial_status = 'awaiting_approval'
-        
-        # Create push
-        pending_push = PendingPush.objects.create(
-            project=project,
-            created_by=request.user,
-            commit_message=commit_message,
-            file_list=file_list,
-            version=version,
-            status=initial_status,
-            progress=0,
-            message='Push request received' if initial_status == 'pending' else 'Awaiting approval'
-        )
-        
         # Start processing if no approval needed
         if initial_status == 'pending':
             try:
@@ -263,7 +485,7 @@ class VersionUploadView(APIView):
                     'details': str(e)
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        return Response(sanitize_dict({
+        return Response(sanitize_dict_in_place({
             'push_uid': pending_push.uid,
             'project_uid': project.uid,
             'project_id': project.id,
@@ -299,35 +521,59 @@ class RequestVersionDownloadView(APIView):
         from django.utils import timezone
         from datetime import timedelta
         
-        recent_request = DownloadRequest.objects.filter(
-            version=version,
-            requested_by=request.user,
-            status__in=['pending', 'processing', 'completed'],
-            created_at__gte=timezone.now() - timedelta(hours=DownloadRequest.EXPIRATION_HOURS)
-        ).first()
+        # The id of the user's latest request for this version is kept in the
+        # Django cache: a repeat click reads that one row by primary key and
+        # skips the row lock and the range lookup below
+        cache_key = recent_download_cache_key(version.pk, request.user.pk)
+        reuse_message = None
+        cached_id = cache.get(cache_key)
+        if cached_id is not None:
+            recent_request = DownloadRequest.objects.filter(
+                pk=cached_id, status__in=DownloadRequest.ACTIVE_STATUSES
+            ).first()
+            if recent_request:
+                reuse_message = recent_request.get_reuse_message()
+        
+        # Concurrent requests for a version are serialized on its row, so only
+        # one of two simultaneous clicks can find nothing reusable and create
+        # (and queue) a new ZIP job; the other reuses that request
+        if reuse_message is None:
+            with transaction.atomic():
+                Version.objects.select_for_update().only('pk').get(pk=version.pk)
+                
+                # Version, project, owner and requester are already in hand, so the
+                # lookup reads the download row alone instead of joining them again
+                recent_request = DownloadRequest.objects.filter(
+                    version=version,
+                    requested_by=request.user,
+                    status__in=DownloadRequest.ACTIVE_STATUSES,
+                    created_at__gte=timezone.now() - timedelta(hours=DownloadRequest.EXPIRATION_HOURS)
+                ).first()
+                
+                if recent_request:
+                    reuse_message = recent_request.get_reuse_message()
+                
+                if reuse_message is None:
+                    # Create new request
+                    download_request = DownloadRequest.objects.create(
+                        version=version,
+                        requested_by=request.user,
+                        status='pending',
+                        progress=0,
+                        message='Download request queued'
+                    )
+            
+            if reuse_message is None:
+                cache.set(cache_key, download_request.pk, DownloadRequest.EXPIRATION_HOURS * 60 * 60)
         
-        if recent_request:
-            if recent_request.status == 'completed' and not recent_request.is_expired():
-                serializer = DownloadRequestSerializer(recent_request, context={'request': request})
-                return Response({
-                    'message': 'Using existing download',
-                    'download': sanitize_dict(serializer.data)
-                })
-            elif recent_request.status in ['pending', 'processing']:
-                serializer = DownloadRequestSerializer(recent_request, context={'request': request})
-                return Response({
-                    'message': 'Download already in progress',
-                    'download': sanitize_dict(serializer.data)
-                })
-        
-        # Create new request
-        download_request = DownloadRequest.objects.create(
-            version=version,
-            requested_by=request.user,
-            status='pending',
-            progress=0,
-            message='Download request queued'
-        )
+        if reuse_message is not None:
+            recent_request.version = version
+            recent_request.requested_by = request.user
+            serializer = DownloadRequestSerializer(recent_request, context={'request': request})
+            return Response({
+                'message': reuse_message,
+                'download': sanitize_dict_in_place(serializer.data)
+            })
         
         try:
             create_download_zip.delay(download_request.id)
@@ -342,7 +588,7 @@ class RequestVersionDownloadView(APIView):
         
         return Response({
             'message': 'Download request created',
-            'download': sanitize_dict(serializer.data)
+            'download': sanitize_dict_in_place(serializer.data)
         }, status=status.HTTP_201_CREATED)
 
 
@@ -352,17 +598,49 @@ class DownloadRequestStatusView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, download_uid):
-        """Get download status"""
-        download_request = get_download_or_404(download_uid, request.user)
+        """
+        Get download status (?wait=<seconds> holds the request until it changes)
+        Polled every few seconds, so the row is read as one values() dict; the
+        permission check runs on its project/owner ids and the serializer gets
+        instances built from it
+        """
+        queryset = DownloadRequest.objects.filter(uid=download_uid)
+        row = queryset.values(*download_status_values()).first()
+        if row is None:
+            raise Http404("Download not found")
+        
+        project = Project(pk=row['version__project_id'], owner_id=row['version__project__owner_id'])
+        if not project.user_can_view(request.user):
+            raise Http404("Download not found")
+        
+        timeout = get_long_poll_timeout(request)
+        if timeout and row['status'] in ('pending', 'processing'):
+            if wait_for_status_change(queryset, row['status'], row['progress'], timeout):
+                row = queryset.values(*download_status_values()).first()
+                if row is None:
+                    raise Http404("Download not found")
         
         # Check expiration
-        if download_request.status == 'completed' and download_request.is_expired():
-            download_request.status = 'expired'
-            download_request.message = 'Download link has expired. Please request a new download.'
-            download_request.save(update_fields=['status', 'message'])
-        
-        serializer = DownloadRequestSerializer(download_request, context={'request': request})
-        return Response(sanitize_dict(serializer.data))
+        from django.utils import timezone
+        if row['status'] == 'completed' and row['expires_at'] and row['expires_at'] < timezone.now():
+            expired = DownloadRequest(pk=row['id'])
+            expired.mark_expired('Download link has expired. Please request a new download.')
+            row.update(status=expired.status, message=expired.message)
+        
+        etag, not_modified = check_status_etag(
+            request, row['uid'], row['status'], row['progress'],
+            row['message'], row['error_details'], row['zip_file']
+        )
+        if not_modified is not None:
+            return not_modified
+        
+        return Response(
+            sanitize_dict_in_place(DownloadRequestSerializer(
+                instance_from_values(DownloadRequest, row, queryset.db),
+                context={'request': request}
+            ).data),
+            headers={'ETag': etag, 'Cache-Control': 'no-cache'}
+        )
 
 
 class VersionDownloadView(APIView):
@@ -383,9 +661,7 @@ class VersionDownloadView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         if download_request.is_expired():
-            download_request.status = 'expired'
-            download_request.message = 'Download link has expired'
-            download_request.save(update_fields=['status', 'message'])
+            download_request.mark_expired('Download link has expired')
             
             return Response({
                 'error': 'Download has expired',
@@ -399,17 +675,32 @@ class VersionDownloadView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
         
         try:
-            version = download_request.version
-            version_number = version.version_number or 'unknown'
-            filename = f"{version.project.name}_v{version_number}.zip"
+            filename = download_request.download_filename
             
-            response = FileResponse(
-                open(download_request.zip_file.path, 'rb'),
-                as_attachment=True,
-                filename=filename
-            )
+            try:
+                zip_path = download_request.zip_file.path
+            except NotImplementedError:
+                # Remote storage (S3/GCS...) has no local path: its (signed)
+                # URL lets the storage serve the bytes without this worker
+                return HttpResponseRedirect(download_request.zip_file.url)
             
-            return response
+            if DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+                # nginx sends the file itself (sendfile) once the worker returns
+                response = HttpResponse(content_type='application/zip')
+                response['X-Accel-Redirect'] = quote(
+                    DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + download_request.zip_file.name
+                )
+                response['Content-Disposition'] = content_disposition_header(True, filename)
+                return response
+            
+            if DOWNLOAD_X_SENDFILE:
+                response = HttpResponse(content_type='application/zip')
+                response['X-Sendfile'] = zip_path
+                response['Content-Disposition'] = content_disposition_header(True, filename)
+                return response
+            
+            # file_size was stat'ed once when the ZIP was finished
+            return ranged_file_response(request, zip_path, filename, download_request.file_size)
         
         except Exception as e:
             return Response({
@@ -434,17 +725,44 @@ class VersionFileListView(APIView):
                 'message': 'This version is still being processed'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # A completed version never changes, so its uid and completion time
+        # identify the listing
+        etag, not_modified = check_etag(
+            request, version.uid,
+            version.completed_at.timestamp() if version.completed_at else 0
+        )
+        if not_modified is not None:
+            return not_modified
+        
+        # Plain JSON clients get the rendered body straight from the cache,
+        # skipping the listing and the renderer altogether
+        renderer = request.accepted_renderer
+        cache_body = (
+            isinstance(renderer, JSONRenderer)
+            and not renderer.get_indent(request.accepted_media_type, self.get_renderer_context())
+        )
+        if cache_body:
+            body = cache.get(version.file_list_body_cache_key)
+            if body is not None:
+                return HttpResponse(body, content_type=renderer.media_type, headers={'ETag': etag})
+        
         try:
             files = get_version_file_list(version)
-            
-            return Response({
+            payload = {
                 'version_uid': version.uid,
                 'version_number': version.version_number,
                 'storage_type': version.get_storage_type(),
                 'file_count': len(files),
                 'files': files,
                 'change_summary': version.get_change_summary()
-            })
+            }
+        
+            if cache_body and files:
+                body = renderer.render(payload, request.accepted_media_type, self.get_renderer_context())
+                cache.set(version.file_list_body_cache_key, body, FILE_LIST_CACHE_SECONDS)
+                return HttpResponse(body, content_type=renderer.media_type, headers={'ETag': etag})
+        
+            return Response(payload, headers={'ETag': etag})
         
         except Exception as e:
             return Response({
@@ -463,11 +781,25 @@ class PushStatusView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, push_uid):
-        """Get status"""
+        """Get status (?wait=<seconds> holds the request until it changes)"""
         push = get_push_or_404(push_uid, request.user)
         
+        timeout = get_long_poll_timeout(request)
+        if timeout and push.status in ('pending', 'approved', 'processing'):
+            if wait_for_status_change(
+                PendingPush.objects.filter(pk=push.pk), push.status, push.progress, timeout
+            ):
+                push.refresh_from_db()
+        
+        etag, not_modified = check_status_etag(
+            request, push.uid, push.status, push.progress,
+            push.message, push.error_details, push.version_id
+        )
+        if not_modified is not None:
+            return not_modified
+        
         serializer = PendingPushSerializer(push, context={'request': request})
-        return Response(sanitize_dict(serializer.data))
+        return Response(sanitize_dict_in_place(serializer.data), headers={'ETag': etag, 'Cache-Control': 'no-cache'})
 
 
 class ApprovePushView(APIView):
@@ -477,7 +809,7 @@ class ApprovePushView(APIView):
     
     def post(self, request, push_uid):
         """Approve"""
-        push = get_push_or_404(push_uid, request.user)
+        push = get_push_or_404(push_uid, request.user, with_file_list=False)
         
         if push.project.owner != request.user:
             raise Http404("Push not found")
@@ -488,7 +820,12 @@ class ApprovePushView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        push.approve(request.user)
+        # A second click that lost the race gets the status the first one set
+        if not push.approve(request.user):
+            return Response(
+                {'error': f'Cannot approve push with status: {push.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
         
         try:
             process_pending_push_new.delay(push.id)
@@ -512,7 +849,7 @@ class RejectPushView(APIView):
     
     def post(self, request, push_uid):
         """Reject"""
-        push = get_push_or_404(push_uid, request.user)
+        push = get_push_or_404(push_uid, request.user, with_file_list=False)
         
         if push.project.owner != request.user:
             raise Http404("Push not found")
@@ -524,7 +861,11 @@ class RejectPushView(APIView):
             )
         
         reason = sanitize_string(request.data.get('reason', ''))
-        push.reject(request.user, reason)
+        if not push.reject(request.user, reason):
+            return Response(
+                {'error': f'Cannot reject push with status: {push.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
         
         return Response({
             'message': 'Push rejected and version removed',
@@ -540,18 +881,22 @@ class CancelPushView(APIView):
     
     def post(self, request, push_uid):
         """Cancel"""
-        push = get_push_or_404(push_uid, request.user)
+        push = get_push_or_404(push_uid, request.user, with_file_list=False)
         
         if push.created_by != request.user and push.project.owner != request.user:
             raise Http404("Push not found")
         
-        if push.status in ['done', 'failed', 'rejected', 'cancelled']:
+        if push.status in PendingPush.FINAL_STATUSES:
             return Response(
                 {'error': f'Cannot cancel push - already {push.status}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        push.cancel()
+        if not push.cancel():
+            return Response(
+                {'error': f'Cannot cancel push - already {push.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
         
         return Response({
             'message': 'Push cancelled successfully',